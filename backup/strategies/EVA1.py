@@ -1,17 +1,18 @@
-from datetime import datetime, timedelta
 import talib.abstract as ta
 import pandas_ta as pta
-from freqtrade.persistence import Trade
-from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
+from freqtrade.enums import RunMode
 from freqtrade.strategy import DecimalParameter, IntParameter
-from functools import reduce
+from functools import partial
+from typing import Optional
+from fqtrade import cached_indicators, signals, streaming
+from fqtrade.eva import EVAStrategy
 import warnings
 
 warnings.simplefilter(action="ignore", category=RuntimeWarning)
 
 
-class EVA1(IStrategy):
+class EVA1(EVAStrategy):
     minimal_roi = {
         "0": 1
     }
@@ -36,13 +37,32 @@ class EVA1(IStrategy):
     buy_rsi_32 = IntParameter(15, 50, default=35, space='buy', optimize=is_optimize_32)
     buy_sma15_32 = DecimalParameter(0.900, 1, default=0.961, decimals=3, space='buy', optimize=is_optimize_32)
     buy_cti_32 = DecimalParameter(-1, 0, default=-0.58, decimals=2, space='buy', optimize=is_optimize_32)
-    sell_fastx = IntParameter(50, 100, default=70, space='sell', optimize=True)
-
-    sell_loss_cci = IntParameter(low=0, high=600, default=148, space='sell', optimize=False)
-    sell_loss_cci_profit = DecimalParameter(-0.15, 0, default=-0.04, decimals=2, space='sell', optimize=False)
-    sell_cci = IntParameter(low=0, high=200, default=90, space='sell', optimize=False)
 
+    stream: Optional[streaming.StreamingIndicators] = None
+
+    def indicator_stream(self) -> Optional[streaming.StreamingIndicators]:
+        """The StreamingIndicators of dry-run / live, created on first use; None in the other modes."""
+        if self.stream is None and self.dp and self.dp.runmode in (RunMode.DRY_RUN, RunMode.LIVE):
+            # same columns as populate_indicators, computed for the new candles only
+            self.stream = streaming.StreamingIndicators({
+                'sma_15': partial(streaming.SMA, 15),
+                'cti': partial(streaming.CTI, 20),
+                'rsi': partial(streaming.RSI, 14),
+                'rsi_fast': partial(streaming.RSI, 4),
+                'rsi_slow': partial(streaming.RSI, 20),
+                'fastk': partial(streaming.StochasticFast, 5, 3),
+                'cci': partial(streaming.CCI, 20),
+            })
+        return self.stream
+
+    @cached_indicators
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        stream = self.indicator_stream()
+        if stream is not None:
+            for (name, values) in stream.update(metadata['pair'], dataframe).items():
+                dataframe[name] = values
+            return dataframe
+
         # buy_1 indicators
         dataframe['sma_15'] = ta.SMA(dataframe, timeperiod=15)
         dataframe['cti'] = pta.cti(dataframe["close"], length=20)
@@ -50,61 +70,19 @@ class EVA1(IStrategy):
         dataframe['rsi_fast'] = ta.RSI(dataframe, timeperiod=4)
         dataframe['rsi_slow'] = ta.RSI(dataframe, timeperiod=20)
         # profit sell indicators
-        stoch_fast = ta.STOCHF(dataframe, 5, 3, 0, 3, 0)
-        dataframe['fastk'] = stoch_fast['fastk']
-
-        dataframe['cci'] = ta.CCI(dataframe, timeperiod=20)
+        self.populate_exit_indicators(dataframe, metadata)
 
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        conditions = []
-        dataframe.loc[:, 'enter_tag'] = ''
+        candles = signals.signal_candles(self, dataframe)
+        conditions = {}
         buy_1 = (
-                (dataframe['rsi_slow'] < dataframe['rsi_slow'].shift(1)) &
-                (dataframe['rsi_fast'] < self.buy_rsi_fast_32.value) &
-                (dataframe['rsi'] > self.buy_rsi_32.value) &
-                (dataframe['close'] < dataframe['sma_15'] * self.buy_sma15_32.value) &
-                (dataframe['cti'] < self.buy_cti_32.value)
+                (candles['rsi_slow'] < candles.shift('rsi_slow', 1)) &
+                (candles['rsi_fast'] < self.buy_rsi_fast_32.value) &
+                (candles['rsi'] > self.buy_rsi_32.value) &
+                (candles['close'] < candles['sma_15'] * self.buy_sma15_32.value) &
+                (candles['cti'] < self.buy_cti_32.value)
         )
-        conditions.append(buy_1)
-        dataframe.loc[buy_1, 'enter_tag'] += 'buy_1'
-        if conditions:
-            dataframe.loc[
-                reduce(lambda x, y: x | y, conditions),
-                'enter_long'] = 1
-        return dataframe
-
-    def custom_exit(self, pair: str, trade: 'Trade', current_time: 'datetime', current_rate: float,
-                    current_profit: float, **kwargs):
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair=pair, timeframe=self.timeframe)
-        current_candle = dataframe.iloc[-1].squeeze()
-                        
-        if current_time - timedelta(minutes=10) < trade.open_date_utc:
-            if current_profit >= 0.05:
-                return "profit_sell_fast"
-
-        if current_profit > 0:
-            if current_candle["fastk"] > self.sell_fastx.value:
-                return "fastk_profit_sell"
-
-            if current_candle["cci"] > self.sell_cci.value:
-                return "cci_profit_sell"
-
-        if current_time - timedelta(hours=2) > trade.open_date_utc:
-            if current_profit > 0:
-                return "profit_sell_in_2h"
-                
-        if current_candle["high"] >= trade.open_rate:
-            if current_candle["cci"] > self.sell_cci.value:
-                return "cci_sell"
-
-        if current_profit > self.sell_loss_cci_profit.value:
-            if current_candle["cci"] > self.sell_loss_cci.value:
-                return "cci_loss_sell"
-
-        return None
-
-    def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        dataframe.loc[(), ['exit_long', 'exit_tag']] = (0, 'long_out')
-        return dataframe
\ No newline at end of file
+        conditions['buy_1'] = buy_1
+        return signals.set_signals(dataframe, candles, conditions, 'enter_long', 'enter_tag')
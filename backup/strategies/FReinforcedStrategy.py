@@ -2,7 +2,7 @@
 # flake8: noqa: F401
 # isort: skip_file
 # --- Do not remove these libs ---
-from functools import reduce
+from functools import cached_property, reduce
 import numpy as np  # noqa
 import pandas as pd  # noqa
 from pandas import DataFrame
@@ -22,6 +22,17 @@ import freqtrade.vendor.qtpylib.indicators as qtpylib
 from freqtrade.exchange import timeframe_to_minutes
 from technical.util import resample_to_interval, resampled_merge
 
+from fqtrade import LazyColumns, bank, indicators
+
+
+def adx(dataframe: DataFrame, period: int):
+    return ta.ADX(dataframe, timeperiod=period)
+
+
+def ema_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    (close,) = indicators.columns(dataframe, "close")
+    return bank.ema(close, periods)
+
 
 # This class is a sample. Feel free to customize it.
 class FReinforcedStrategy(IStrategy):
@@ -59,19 +70,14 @@ class FReinforcedStrategy(IStrategy):
     ema_short_period = IntParameter(4, 24, default=8)
     ema_long_period = IntParameter(12, 175, default=21)
 
-    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-
-        # Calculate all adx values
-        for val in self.adx_period.range:
-            dataframe[f"adx_{val}"] = ta.ADX(dataframe, timeperiod=val)
+    @cached_property
+    def lazy_columns(self) -> LazyColumns:
+        # adx_{n} is computed for the periods an epoch uses, not for every value of the parameter
+        # range; ema_short_{n} / ema_long_{n} are rows of one EMA bank per parameter range
+        return LazyColumns(self.timeframe, {'adx': adx, 'ema_short': ema_bank, 'ema_long': ema_bank},
+                           banks={'ema_short': self.ema_short_period, 'ema_long': self.ema_long_period})
 
-        # Calculate all ema_short values
-        for val in self.ema_short_period.range:
-            dataframe[f"ema_short_{val}"] = ta.EMA(dataframe, timeperiod=val)
-
-        # Calculate all ema_long values
-        for val in self.ema_long_period.range:
-            dataframe[f"ema_long_{val}"] = ta.EMA(dataframe, timeperiod=val)
+    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
 
         # required for graphing
         bollinger = qtpylib.bollinger_bands(dataframe["close"], window=20, stds=2)
@@ -87,6 +93,8 @@ class FReinforcedStrategy(IStrategy):
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        self.lazy_columns.provide(dataframe, metadata["pair"], f"ema_short_{self.ema_short_period.value}",
+                                  f"ema_long_{self.ema_long_period.value}")
         conditions_long = []
         conditions_short = []
 
@@ -125,6 +133,7 @@ class FReinforcedStrategy(IStrategy):
         return dataframe
 
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        self.lazy_columns.provide(dataframe, metadata["pair"], f"adx_{self.adx_period.value}")
 
         conditions_close = []
         conditions_close.append(
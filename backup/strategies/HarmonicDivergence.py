@@ -3,12 +3,12 @@
 
 # --- Do not remove these libs ---
 import datetime
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import numpy as np  # noqa
 import pandas as pd  # noqa
-pd.options.mode.chained_assignment = None
 from pandas import DataFrame, Series
 from technical.util import resample_to_interval, resampled_merge
+from freqtrade.enums import RunMode
 from freqtrade.strategy import IStrategy, merge_informative_pair
 from freqtrade.strategy import CategoricalParameter, DecimalParameter, IntParameter
 
@@ -17,7 +17,13 @@ from freqtrade.strategy import CategoricalParameter, DecimalParameter, IntParame
 # Add your lib to import here
 import talib.abstract as ta
 import freqtrade.vendor.qtpylib.indicators as qtpylib
+import bisect
 from collections import deque
+from functools import cached_property
+from fqtrade import CandleIndex, ColumnBuffer, TradeLevels, cached_indicators, closes_trade, indicators, kernels
+
+# indicators scanned for divergences, the position in this list is the bit used in total_*_divergences_mask
+DIVERGENCE_INDICATORS = ['rsi', 'stoch', 'roc', 'uo', 'ao', 'macd', 'cci', 'cmf', 'obv', 'mfi', 'adx']
 
 
 class PlotConfig():
@@ -136,9 +142,9 @@ class PlotConfig():
             } 
         return self
 
-    def add_total_divergences_in_config(self, dataframe):
+    def add_total_divergences_in_config(self, dataframe, indicators: List[str] = DIVERGENCE_INDICATORS):
         total_bullish_divergences_count = dataframe[resample("total_bullish_divergences_count")]
-        total_bullish_divergences_names = dataframe[resample("total_bullish_divergences_names")]
+        total_bullish_divergences_names = divergence_names(dataframe[resample("total_bullish_divergences_mask")], indicators)
         self.config['main_plot'][resample("total_bullish_divergences")] = {
             "plotly": {
                 'mode': 'markers+text',
@@ -157,7 +163,7 @@ class PlotConfig():
             }
         }
         total_bearish_divergences_count = dataframe[resample("total_bearish_divergences_count")]
-        total_bearish_divergences_names = dataframe[resample("total_bearish_divergences_names")]
+        total_bearish_divergences_names = divergence_names(dataframe[resample("total_bearish_divergences_mask")], indicators)
         self.config['main_plot'][resample("total_bearish_divergences")] = {
             "plotly": {
                 'mode': 'markers+text',
@@ -176,7 +182,51 @@ class PlotConfig():
             }
         }
         return self
-        
+
+def build_plot_config(totals) -> dict:
+    plot_config = (
+        PlotConfig()
+        # .add_pivots_in_config()
+        # .add_divergence_in_config('rsi')
+        # .add_divergence_in_config('stoch')
+        # .add_divergence_in_config('roc')
+        # .add_divergence_in_config('uo')
+        # .add_divergence_in_config('ao')
+        # .add_divergence_in_config('macd')
+        # .add_divergence_in_config('cci')
+        # .add_divergence_in_config('cmf')
+        # .add_divergence_in_config('obv')
+        # .add_divergence_in_config('mfi')
+        # .add_divergence_in_config('adx')
+    )
+    if totals is not None:
+        plot_config.add_total_divergences_in_config(totals)
+    return plot_config.config
+
+def plot_totals(dataframe: DataFrame) -> DataFrame:
+    """Copy of the total_*_divergences_count / _mask columns, all that build_plot_config reads."""
+    return dataframe[[resample("total_" + side + "_divergences_" + kind)
+                      for side in ('bullish', 'bearish') for kind in ('count', 'mask')]].copy()
+
+class LazyPlotConfig():
+    """
+    Class level plot_config that is built only when a plotting / API consumer reads it,
+    from the divergence totals of the last dataframe the strategy analyzed (its `plot_totals`
+    attribute). The result is memoized until another dataframe has been analyzed.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self.config = None
+        self.source = None
+
+    def __get__(self, instance, owner) -> dict:
+        totals = getattr(owner, 'plot_totals', None)
+        if self.config is None or self.source is not totals:
+            self.config = self.build(totals)
+            self.source = totals
+        return self.config
+
 class HarmonicDivergence(IStrategy):
     """
     This is a strategy template to get you started.
@@ -255,7 +305,29 @@ class HarmonicDivergence(IStrategy):
         'exit': 'gtc'
     }
 
-    plot_config = None
+    plot_config = LazyPlotConfig(build_plot_config)
+    plot_totals = None
+
+    # Backend of the pivot / divergence loops: 'numpy', 'numba' (compiled kernels, falls back to
+    # numpy when numba is not installed) or 'auto' (numba when available). Results are identical.
+    divergence_backend = 'auto'
+
+    # In dry-run / live, only scan the candles added since the last analysis for divergences
+    # (see DivergenceState) instead of the whole history on every throttle tick.
+    incremental_divergences = True
+
+    # per instance state is created on first use, so that it exists without bot_start too
+    @cached_property
+    def candle_index(self) -> CandleIndex:
+        return CandleIndex()
+
+    @cached_property
+    def trade_levels(self) -> TradeLevels:
+        return TradeLevels()
+
+    @cached_property
+    def divergence_states(self) -> Dict[str, 'DivergenceState']:
+        return {}
 
     def get_ticker_indicator(self):
         return int(self.timeframe[:-1])
@@ -271,7 +343,16 @@ class HarmonicDivergence(IStrategy):
         :param metadata: Additional information, like the currently traded pair
         :return: a Dataframe with all mandatory indicators for the strategies
         """
+        dataframe = self.divergence_indicators(dataframe, metadata)
+        # plot_config is only built from these totals when something reads it; set here, as
+        # divergence_indicators may come from the indicator cache without running. Only the
+        # totals are kept, not the whole dataframe.
+        HarmonicDivergence.plot_totals = plot_totals(dataframe)
+        return dataframe
 
+    @cached_indicators
+    def divergence_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        """The columns of populate_indicators, a function of the dataframe and the parameters only."""
         # Get the informative pair
         # informative = self.dp.get_pair_dataframe(pair=metadata['pair'], timeframe='15m')
         # informative = resample_to_interval(dataframe, self.get_ticker_indicator() * 15)
@@ -294,7 +375,8 @@ class HarmonicDivergence(IStrategy):
         # Commodity Channel Index
         informative['cci'] = ta.CCI(informative)
         # CMF
-        informative['cmf'] = chaikin_money_flow(informative, 20)
+        high, low, close, volume = indicators.columns(informative, 'high', 'low', 'close', 'volume')
+        informative['cmf'] = indicators.chaikin_money_flow(high, low, close, volume, 20)
         # OBV
         informative['obv'] = ta.OBV(informative)
         # MFI
@@ -302,12 +384,20 @@ class HarmonicDivergence(IStrategy):
         # ADX
         informative['adx'] = ta.ADX(informative)
 
+        # EMA - Exponential Moving Average
+        informative['ema9'] = ta.EMA(informative, timeperiod=9)
+        informative['ema20'] = ta.EMA(informative, timeperiod=20)
+        informative['ema50'] = ta.EMA(informative, timeperiod=50)
+        informative['ema200'] = ta.EMA(informative, timeperiod=200)
+
         # ATR
-        informative['atr'] = qtpylib.atr(informative, window=14, exp=False)
+        true_range = indicators.true_range(high, low, close)
+        informative['atr'] = indicators.atr(high, low, close, window=14, ranges=true_range)
 
         # Keltner Channel
         # keltner = qtpylib.keltner_channel(dataframe, window=20, atrs=1)
-        keltner = emaKeltner(informative)
+        keltner = indicators.keltner_channel(informative['ema20'].to_numpy(),
+                                             indicators.atr(high, low, close, window=10, ranges=true_range))
         informative["kc_upperband"] = keltner["upper"]
         informative["kc_middleband"] = keltner["mid"]
         informative["kc_lowerband"] = keltner["lower"]
@@ -316,14 +406,8 @@ class HarmonicDivergence(IStrategy):
         bollinger = qtpylib.bollinger_bands(qtpylib.typical_price(informative), window=20, stds=2)
         informative['bollinger_upperband'] = bollinger['upper']
         informative['bollinger_lowerband'] = bollinger['lower']
-
-        # EMA - Exponential Moving Average
-        informative['ema9'] = ta.EMA(informative, timeperiod=9)
-        informative['ema20'] = ta.EMA(informative, timeperiod=20)
-        informative['ema50'] = ta.EMA(informative, timeperiod=50)
-        informative['ema200'] = ta.EMA(informative, timeperiod=200)        
         
-        pivots = pivot_points(informative)
+        pivots = pivot_points(informative, backend=self.divergence_backend)
         informative['pivot_lows'] = pivots['pivot_lows']
         informative['pivot_highs'] = pivots['pivot_highs']
 
@@ -334,18 +418,15 @@ class HarmonicDivergence(IStrategy):
         # Full documentation of this method, see below
  
 
-        initialize_divergences_lists(informative)
-        add_divergences(informative, 'rsi')
-        add_divergences(informative, 'stoch')
-        add_divergences(informative, 'roc')
-        add_divergences(informative, 'uo')
-        add_divergences(informative, 'ao')
-        add_divergences(informative, 'macd')
-        add_divergences(informative, 'cci')
-        add_divergences(informative, 'cmf')
-        add_divergences(informative, 'obv')
-        add_divergences(informative, 'mfi')
-        add_divergences(informative, 'adx')
+        divergences = ColumnBuffer(informative)
+        initialize_divergences_lists(divergences)
+        state = None
+        if self.incremental_divergences and self.dp and self.dp.runmode in (RunMode.DRY_RUN, RunMode.LIVE):
+            if metadata['pair'] not in self.divergence_states:
+                self.divergence_states[metadata['pair']] = DivergenceState(DIVERGENCE_INDICATORS)
+            state = self.divergence_states[metadata['pair']]
+        add_divergences(informative, DIVERGENCE_INDICATORS, divergences, self.divergence_backend, state)
+        divergences.commit()
 
         # print("-------------------informative-------------------")
         # print(informative)
@@ -359,27 +440,11 @@ class HarmonicDivergence(IStrategy):
         #     if value < 0.5:
         #         dataframe[resample("total_bullish_divergences_count")][index] = None
         #         dataframe[resample("total_bullish_divergences")][index] = None
-        #         dataframe[resample("total_bullish_divergences_names")][index] = None
+        #         dataframe[resample("total_bullish_divergences_mask")][index] = None
         #     else:
         #         print(value)
         #         print(dataframe[resample("total_bullish_divergences")][index])
-        #         print(dataframe[resample("total_bullish_divergences_names")][index])
-        HarmonicDivergence.plot_config = (
-            PlotConfig()
-            # .add_pivots_in_config()
-            # .add_divergence_in_config('rsi')
-            # .add_divergence_in_config('stoch')
-            # .add_divergence_in_config('roc')
-            # .add_divergence_in_config('uo')
-            # .add_divergence_in_config('ao')
-            # .add_divergence_in_config('macd')
-            # .add_divergence_in_config('cci')
-            # .add_divergence_in_config('cmf')
-            # .add_divergence_in_config('obv')
-            # .add_divergence_in_config('mfi')
-            # .add_divergence_in_config('adx')
-            .add_total_divergences_in_config(dataframe)
-            .config)
+        #         print(dataframe[resample("total_bullish_divergences_mask")][index])
 
         return dataframe
 
@@ -428,15 +493,8 @@ class HarmonicDivergence(IStrategy):
     def custom_exit(self, pair: str, trade: 'Trade', current_time: 'datetime', current_rate: float,
                     current_profit: float, **kwargs):
 
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-        takeprofit = 999999
+        takeprofit = self.exit_levels(pair, trade).get('takeprofit', 999999)
         # self.trailing_stop = False
-        
-        for i in range(1,len(dataframe['close'])):
-            if dataframe.iloc[-i]['date'].to_pydatetime().replace(tzinfo=datetime.timezone.utc) == trade.open_date_utc:
-                buy_candle = dataframe.iloc[-i-1].squeeze()
-                takeprofit = buy_candle[resample('high')] + buy_candle[resample('atr')]
-                break
 
         # if takeprofit < current_rate:
             # self.trailing_stop = True
@@ -445,15 +503,7 @@ class HarmonicDivergence(IStrategy):
     def custom_stoploss(self, pair: str, trade: 'Trade', current_time: datetime,
                             current_rate: float, current_profit: float, **kwargs) -> float:
 
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-        stoploss = 999999
-
-        for i in range(1,len(dataframe['close'])):            
-            if dataframe.iloc[-i]['date'].to_pydatetime().replace(tzinfo=datetime.timezone.utc) == trade.open_date_utc:
-                buy_candle = dataframe.iloc[-i-1].squeeze()
-                stoploss = buy_candle[resample('low')] - buy_candle[resample('atr')]
-                # stoploss = buy_candle[resample('high')] - buy_candle[resample('atr')]
-                break
+        stoploss = self.exit_levels(pair, trade).get('stoploss', 999999)
 
         # Convert absolute price to percentage relative to current_rate
         if stoploss < current_rate:
@@ -462,6 +512,34 @@ class HarmonicDivergence(IStrategy):
         # return maximum stoploss value, keeping current stoploss price unchanged
         return 1
 
+    def order_filled(self, pair: str, trade: 'Trade', order: 'Order', current_time: datetime, **kwargs) -> None:
+        if order.ft_order_side == trade.entry_side:
+            if trade.nr_of_successful_entries == 1:
+                self.exit_levels(pair, trade)
+        elif closes_trade(trade, order):
+            self.trade_levels.discard(trade)
+
+    def exit_levels(self, pair: str, trade: 'Trade') -> dict:
+        """
+        Stoploss and takeprofit prices of a trade, computed from its entry candle the first
+        time they are needed (normally when the entry order fills) and read back afterwards.
+        Empty while the entry candle can not be found in the analyzed dataframe.
+        """
+        levels = self.trade_levels.get(trade)
+        if levels is None:
+            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
+            # the signal candle is the one before the candle the trade was opened in
+            buy_candle = self.candle_index.row(pair, dataframe, trade.open_date_utc, [resample('low'), resample('high'), resample('atr')], offset=-1)
+            if buy_candle is None:
+                return {}
+            levels = {
+                'stoploss': float(buy_candle[resample('low')] - buy_candle[resample('atr')]),
+                # 'stoploss': float(buy_candle[resample('high')] - buy_candle[resample('atr')]),
+                'takeprofit': float(buy_candle[resample('high')] + buy_candle[resample('atr')]),
+            }
+            self.trade_levels.set(trade, levels)
+        return levels
+
 def resample(indicator):
     # return "resample_15_" + indicator
     return indicator
@@ -507,167 +585,178 @@ def ema_check(dataframe):
         & (dataframe[resample('ema50')] < dataframe[resample('ema200')]))
     return ~check
 
-def initialize_divergences_lists(dataframe: DataFrame):
-    dataframe["total_bullish_divergences"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bullish_divergences_count"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bullish_divergences_count"] = [0 if x != x else x for x in dataframe["total_bullish_divergences_count"]]
-    dataframe["total_bullish_divergences_names"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bullish_divergences_names"] = ['' if x != x else x for x in dataframe["total_bullish_divergences_names"]]
-    dataframe["total_bearish_divergences"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bearish_divergences_count"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bearish_divergences_count"] = [0 if x != x else x for x in dataframe["total_bearish_divergences_count"]]
-    dataframe["total_bearish_divergences_names"] = np.empty(len(dataframe['close'])) * np.nan
-    dataframe["total_bearish_divergences_names"] = ['' if x != x else x for x in dataframe["total_bearish_divergences_names"]]
-
-def add_divergences(dataframe: DataFrame, indicator: str):
-    (bearish_divergences, bearish_lines, bullish_divergences, bullish_lines) = divergence_finder_dataframe(dataframe, indicator)
-    dataframe['bearish_divergence_' + indicator + '_occurence'] = bearish_divergences
-    # for index, bearish_line in enumerate(bearish_lines):
-    #     dataframe['bearish_divergence_' + indicator + '_line_'+ str(index)] = bearish_line
-    dataframe['bullish_divergence_' + indicator + '_occurence'] = bullish_divergences
-    # for index, bullish_line in enumerate(bullish_lines):
-    #     dataframe['bullish_divergence_' + indicator + '_line_'+ str(index)] = bullish_line
-
-def divergence_finder_dataframe(dataframe: DataFrame, indicator_source: str) -> Tuple[pd.Series, pd.Series]:
-    bearish_lines = [np.empty(len(dataframe['close'])) * np.nan]
-    bearish_divergences = np.empty(len(dataframe['close'])) * np.nan
-    bullish_lines = [np.empty(len(dataframe['close'])) * np.nan]
-    bullish_divergences = np.empty(len(dataframe['close'])) * np.nan
-    low_iterator = []
-    high_iterator = []
-
-    for index, row in enumerate(dataframe.itertuples(index=True, name='Pandas')):
-        if np.isnan(row.pivot_lows):
-            low_iterator.append(0 if len(low_iterator) == 0 else low_iterator[-1])
-        else:
-            low_iterator.append(index)
-        if np.isnan(row.pivot_highs):
-            high_iterator.append(0 if len(high_iterator) == 0 else high_iterator[-1])
-        else:
-            high_iterator.append(index)
-
-    for index, row in enumerate(dataframe.itertuples(index=True, name='Pandas')):
-
-        bearish_occurence = bearish_divergence_finder(dataframe,
-            dataframe[indicator_source],
-            high_iterator,
-            index)
-
-        if bearish_occurence != None:
-            (prev_pivot , current_pivot) = bearish_occurence 
-            bearish_prev_pivot = dataframe['close'][prev_pivot]
-            bearish_current_pivot = dataframe['close'][current_pivot]
-            bearish_ind_prev_pivot = dataframe[indicator_source][prev_pivot]
-            bearish_ind_current_pivot = dataframe[indicator_source][current_pivot]
-            length = current_pivot - prev_pivot
-            bearish_lines_index = 0
-            can_exist = True
-            while(True):
-                can_draw = True
-                if bearish_lines_index <= len(bearish_lines):
-                    bearish_lines.append(np.empty(len(dataframe['close'])) * np.nan)
-                actual_bearish_lines = bearish_lines[bearish_lines_index]
-                for i in range(length + 1):
-                    point = bearish_prev_pivot + (bearish_current_pivot - bearish_prev_pivot) * i / length
-                    indicator_point =  bearish_ind_prev_pivot + (bearish_ind_current_pivot - bearish_ind_prev_pivot) * i / length
-                    if i != 0 and i != length:
-                        if (point <= dataframe['close'][prev_pivot + i] 
-                        or indicator_point <= dataframe[indicator_source][prev_pivot + i]):
-                            can_exist = False
-                    if not np.isnan(actual_bearish_lines[prev_pivot + i]):
-                        can_draw = False
-                if not can_exist:
-                    break
-                if can_draw:
-                    for i in range(length + 1):
-                        actual_bearish_lines[prev_pivot + i] = bearish_prev_pivot + (bearish_current_pivot - bearish_prev_pivot) * i / length
-                    break
-                bearish_lines_index = bearish_lines_index + 1
-            if can_exist:
-                bearish_divergences[index] = row.close
-                dataframe["total_bearish_divergences"][index] = row.close
-                if index > 30:
-                    dataframe["total_bearish_divergences_count"][index-30] = dataframe["total_bearish_divergences_count"][index-30] + 1
-                    dataframe["total_bearish_divergences_names"][index-30] = dataframe["total_bearish_divergences_names"][index-30] + indicator_source.upper() + '<br>'
-
-        bullish_occurence = bullish_divergence_finder(dataframe,
-            dataframe[indicator_source],
-            low_iterator,
-            index)
-        
-        if bullish_occurence != None:
-            (prev_pivot , current_pivot) = bullish_occurence
-            bullish_prev_pivot = dataframe['close'][prev_pivot]
-            bullish_current_pivot = dataframe['close'][current_pivot]
-            bullish_ind_prev_pivot = dataframe[indicator_source][prev_pivot]
-            bullish_ind_current_pivot = dataframe[indicator_source][current_pivot]
-            length = current_pivot - prev_pivot
-            bullish_lines_index = 0
-            can_exist = True
-            while(True):
-                can_draw = True
-                if bullish_lines_index <= len(bullish_lines):
-                    bullish_lines.append(np.empty(len(dataframe['close'])) * np.nan)
-                actual_bullish_lines = bullish_lines[bullish_lines_index]
-                for i in range(length + 1):
-                    point = bullish_prev_pivot + (bullish_current_pivot - bullish_prev_pivot) * i / length
-                    indicator_point =  bullish_ind_prev_pivot + (bullish_ind_current_pivot - bullish_ind_prev_pivot) * i / length
-                    if i != 0 and i != length:
-                        if (point >= dataframe['close'][prev_pivot + i] 
-                        or indicator_point >= dataframe[indicator_source][prev_pivot + i]):
-                            can_exist = False
-                    if not np.isnan(actual_bullish_lines[prev_pivot + i]):
-                        can_draw = False
-                if not can_exist:
-                    break
-                if can_draw:
-                    for i in range(length + 1):
-                        actual_bullish_lines[prev_pivot + i] = bullish_prev_pivot + (bullish_current_pivot - bullish_prev_pivot) * i / length
-                    break
-                bullish_lines_index = bullish_lines_index + 1
-            if can_exist:
-                bullish_divergences[index] = row.close
-                dataframe["total_bullish_divergences"][index] = row.close
-                if index > 30:
-                    dataframe["total_bullish_divergences_count"][index-30] = dataframe["total_bullish_divergences_count"][index-30] + 1
-                    dataframe["total_bullish_divergences_names"][index-30] = dataframe["total_bullish_divergences_names"][index-30] + indicator_source.upper() + '<br>'
-    
+def initialize_divergences_lists(divergences: ColumnBuffer):
+    divergences.add("total_bullish_divergences")
+    divergences.add("total_bullish_divergences_count", 0, dtype=np.int64)
+    divergences.add("total_bullish_divergences_mask", 0, dtype=np.int64)
+    divergences.add("total_bearish_divergences")
+    divergences.add("total_bearish_divergences_count", 0, dtype=np.int64)
+    divergences.add("total_bearish_divergences_mask", 0, dtype=np.int64)
+
+def divergence_names(masks: Series, indicators: List[str]) -> Series:
+    """Decode a total_*_divergences_mask column into the '<br>' separated indicator names shown on hover."""
+    names = Series('', index=masks.index, dtype=object)
+    for bit, indicator in enumerate(indicators):
+        names[(masks & (1 << bit)) != 0] += indicator.upper() + '<br>'
+    return names
+
+def add_divergences(dataframe: DataFrame, indicators: List[str], divergences: ColumnBuffer, backend: str = 'numpy',
+                    state: 'DivergenceState' = None):
+    if state is not None:
+        (bearish_divergences, bearish_lines, bullish_divergences, bullish_lines) = state.update(dataframe, divergences)
+    else:
+        (bearish_divergences, bearish_lines, bullish_divergences, bullish_lines) = divergence_finder_dataframe(dataframe, indicators, divergences, backend)
+    for column, indicator in enumerate(indicators):
+        divergences['bearish_divergence_' + indicator + '_occurence'] = bearish_divergences[:, column]
+        # for index, bearish_line in enumerate(divergence_lines_to_dense(bearish_lines[column], len(dataframe))):
+        #     divergences['bearish_divergence_' + indicator + '_line_'+ str(index)] = bearish_line
+        divergences['bullish_divergence_' + indicator + '_occurence'] = bullish_divergences[:, column]
+        # for index, bullish_line in enumerate(divergence_lines_to_dense(bullish_lines[column], len(dataframe))):
+        #     divergences['bullish_divergence_' + indicator + '_line_'+ str(index)] = bullish_line
+
+def divergence_finder_dataframe(dataframe: DataFrame, indicator_sources: List[str], divergences: ColumnBuffer,
+                                backend: str = 'numpy') -> Tuple[np.ndarray, list, np.ndarray, list]:
+    """Scan all indicator columns for divergences in a single walk over the pivots.
+    Occurences are returned as (candles x indicators) arrays. Lines are returned per indicator
+    as slots of (start, end, start_value, end_value) segments, see divergence_lines_to_dense.
+    The totals are accumulated in the total_* columns of `divergences`.
+    """
+    close = dataframe['close'].to_numpy(dtype=np.float64)
+    pivot_lows = dataframe['pivot_lows'].to_numpy(dtype=np.float64)
+    pivot_highs = dataframe['pivot_highs'].to_numpy(dtype=np.float64)
+    indicators = np.ascontiguousarray(dataframe[indicator_sources].to_numpy(dtype=np.float64))
+    bearish_lines = [[] for _ in indicator_sources]
+    bearish_divergences = np.empty(indicators.shape) * np.nan
+    bullish_lines = [[] for _ in indicator_sources]
+    bullish_divergences = np.empty(indicators.shape) * np.nan
+    (low_positions, _) = pivot_index(pivot_lows)
+    (high_positions, _) = pivot_index(pivot_highs)
+    total_bearish_divergences = divergences["total_bearish_divergences"]
+    total_bearish_divergences_count = divergences["total_bearish_divergences_count"]
+    total_bearish_divergences_mask = divergences["total_bearish_divergences_mask"]
+    total_bullish_divergences = divergences["total_bullish_divergences"]
+    total_bullish_divergences_count = divergences["total_bullish_divergences_count"]
+    total_bullish_divergences_mask = divergences["total_bullish_divergences_mask"]
+
+    for (index, column, prev_pivot) in divergence_hits(close, pivot_highs, high_positions, indicators, True, backend):
+        add_divergence_line(bearish_lines[column], prev_pivot, index, close[prev_pivot], close[index])
+        bearish_divergences[index, column] = close[index]
+        total_bearish_divergences[index] = close[index]
+        if index > 30:
+            total_bearish_divergences_count[index-30] += 1
+            total_bearish_divergences_mask[index-30] |= 1 << column
+
+    for (index, column, prev_pivot) in divergence_hits(close, pivot_lows, low_positions, indicators, False, backend):
+        add_divergence_line(bullish_lines[column], prev_pivot, index, close[prev_pivot], close[index])
+        bullish_divergences[index, column] = close[index]
+        total_bullish_divergences[index] = close[index]
+        if index > 30:
+            total_bullish_divergences_count[index-30] += 1
+            total_bullish_divergences_mask[index-30] |= 1 << column
+
     return (bearish_divergences, bearish_lines, bullish_divergences, bullish_lines)
 
-def bearish_divergence_finder(dataframe, indicator, high_iterator, index):
-    if high_iterator[index] == index:
-        current_pivot = high_iterator[index]
-        occurences = list(dict.fromkeys(high_iterator))
-        current_index = occurences.index(high_iterator[index])
-        for i in range(current_index-1,current_index-6,-1):            
-            prev_pivot = occurences[i]
-            if np.isnan(prev_pivot):
-                return
-            if ((dataframe['pivot_highs'][current_pivot] < dataframe['pivot_highs'][prev_pivot] and indicator[current_pivot] > indicator[prev_pivot])
-            or (dataframe['pivot_highs'][current_pivot] > dataframe['pivot_highs'][prev_pivot] and indicator[current_pivot] < indicator[prev_pivot])):
-                return (prev_pivot , current_pivot)
-    return None
-
-def bullish_divergence_finder(dataframe, indicator, low_iterator, index):
-    if low_iterator[index] == index:
-        current_pivot = low_iterator[index]
-        occurences = list(dict.fromkeys(low_iterator))
-        current_index = occurences.index(low_iterator[index])
-        for i in range(current_index-1,current_index-6,-1):
-            prev_pivot = occurences[i]
-            if np.isnan(prev_pivot):
-                return 
-            if ((dataframe['pivot_lows'][current_pivot] < dataframe['pivot_lows'][prev_pivot] and indicator[current_pivot] > indicator[prev_pivot])
-            or (dataframe['pivot_lows'][current_pivot] > dataframe['pivot_lows'][prev_pivot] and indicator[current_pivot] < indicator[prev_pivot])):
-                return (prev_pivot, current_pivot)
-    return None
+def divergence_hits(close: np.ndarray, pivots: np.ndarray, positions: np.ndarray, indicators: np.ndarray,
+                    bearish: bool, backend: str = 'numpy') -> List[Tuple[int, int, int]]:
+    """(pivot, indicator column, previous pivot) of every divergence between pivot highs (bearish)
+    or pivot lows (bullish) whose line does not cross price or indicator, in pivot order."""
+    if kernels.use_jit(backend):
+        return [tuple(hit) for hit in kernels.divergence_hits_kernel(close, pivots, positions, indicators, bearish).tolist()]
+
+    hits = []
+    for current_rank in range(len(positions)):
+        hits.extend(pivot_divergence_hits(close, pivots, positions, indicators, current_rank, bearish))
+    return hits
+
+def pivot_divergence_hits(close: np.ndarray, pivots: np.ndarray, positions: np.ndarray, indicators: np.ndarray,
+                          current_rank: int, bearish: bool) -> List[Tuple[int, int, int]]:
+    """Divergence hits of the pivot at `current_rank` of `positions`, see divergence_hits."""
+    finder = bearish_divergence_finder if bearish else bullish_divergence_finder
+    prev_pivots = finder(pivots, indicators, positions, current_rank)
+    index = positions[current_rank]
+    hits = []
+    for column, prev_pivot in enumerate(prev_pivots):
+        if prev_pivot < 0:
+            continue
+        indicator = indicators[:, column]
+        current_pivot = index
+        length = current_pivot - prev_pivot
+        price_line = interpolate_line(close[prev_pivot], close[current_pivot], length)
+        indicator_line = interpolate_line(indicator[prev_pivot], indicator[current_pivot], length)
+        if bearish:
+            # the line must stay strictly above price and indicator between the two pivots
+            crosses = (price_line <= close[prev_pivot + 1:current_pivot]) | (indicator_line <= indicator[prev_pivot + 1:current_pivot])
+        else:
+            # the line must stay strictly below price and indicator between the two pivots
+            crosses = (price_line >= close[prev_pivot + 1:current_pivot]) | (indicator_line >= indicator[prev_pivot + 1:current_pivot])
+        if not crosses.any():
+            hits.append((int(index), column, int(prev_pivot)))
+    return hits
+
+def interpolate_line(start_value, end_value, length):
+    """Values of the straight line between two pivots `length` candles apart, pivots excluded."""
+    return start_value + (end_value - start_value) * np.arange(1, length) / length
+
+def add_divergence_line(lines: list, start: int, end: int, start_value: float, end_value: float):
+    """Store a divergence line segment in the first slot where it overlaps no other line.
+    Pivots are walked in order, so segment ends only grow and the last segment of a slot
+    is the only one the new segment can overlap.
+    """
+    for segments in lines:
+        if segments[-1][1] < start:
+            segments.append((start, end, start_value, end_value))
+            return
+    lines.append([(start, end, start_value, end_value)])
+
+def divergence_lines_to_dense(lines: list, length: int) -> List[np.ndarray]:
+    """Materialize the line slots of one indicator as full-length arrays (NaN outside the lines) for plotting."""
+    dense_lines = []
+    for segments in lines:
+        dense_line = np.empty(length) * np.nan
+        for (start, end, start_value, end_value) in segments:
+            dense_line[start:end + 1] = start_value + (end_value - start_value) * np.arange(end - start + 1) / (end - start)
+        dense_lines.append(dense_line)
+    return dense_lines
+
+def pivot_index(pivots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Compact index over a pivot column (NaN where the candle is not a pivot).
+    Returns the sorted positions of the pivots and, for every row, the rank of the
+    last pivot at or before it in that array (-1 before the first pivot), so the
+    previous pivots of any row are a plain slice of the positions.
+    """
+    is_pivot = ~np.isnan(pivots)
+    return (np.flatnonzero(is_pivot), np.cumsum(is_pivot) - 1)
+
+def bearish_divergence_finder(pivot_highs, indicators, high_positions, current_rank):
+    """For every indicator column, the most recent of the previous 5 pivot highs that diverges
+    from the pivot high at `current_rank`, or -1 when there is none."""
+    current_pivot = high_positions[current_rank]
+    prev_pivots = high_positions[max(current_rank - 5, 0):current_rank][::-1]
+    if len(prev_pivots) == 0:
+        return np.full(indicators.shape[1], -1)
+    diverges = (
+        ((pivot_highs[current_pivot] < pivot_highs[prev_pivots])[:, None] & (indicators[current_pivot] > indicators[prev_pivots]))
+        | ((pivot_highs[current_pivot] > pivot_highs[prev_pivots])[:, None] & (indicators[current_pivot] < indicators[prev_pivots])))
+    return np.where(diverges.any(axis=0), prev_pivots[diverges.argmax(axis=0)], -1)
+
+def bullish_divergence_finder(pivot_lows, indicators, low_positions, current_rank):
+    """For every indicator column, the most recent of the previous 5 pivot lows that diverges
+    from the pivot low at `current_rank`, or -1 when there is none."""
+    current_pivot = low_positions[current_rank]
+    prev_pivots = low_positions[max(current_rank - 5, 0):current_rank][::-1]
+    if len(prev_pivots) == 0:
+        return np.full(indicators.shape[1], -1)
+    diverges = (
+        ((pivot_lows[current_pivot] < pivot_lows[prev_pivots])[:, None] & (indicators[current_pivot] > indicators[prev_pivots]))
+        | ((pivot_lows[current_pivot] > pivot_lows[prev_pivots])[:, None] & (indicators[current_pivot] < indicators[prev_pivots])))
+    return np.where(diverges.any(axis=0), prev_pivots[diverges.argmax(axis=0)], -1)
 
 from enum import Enum
 class PivotSource(Enum):
     HighLow = 0
     Close = 1
 
-def pivot_points(dataframe: DataFrame, window: int = 5, pivot_source: PivotSource = PivotSource.Close) -> DataFrame:
+def pivot_source_columns(pivot_source: PivotSource) -> Tuple[str, str]:
     high_source = None
     low_source = None
 
@@ -677,89 +766,213 @@ def pivot_points(dataframe: DataFrame, window: int = 5, pivot_source: PivotSourc
     elif pivot_source == PivotSource.HighLow:
         high_source = 'high'
         low_source = 'low'
+    return (high_source, low_source)
+
+def pivot_points(dataframe: DataFrame, window: int = 5, pivot_source: PivotSource = PivotSource.Close,
+                 backend: str = 'numpy') -> DataFrame:
+    (high_source, low_source) = pivot_source_columns(pivot_source)
+
+    highs = dataframe[high_source].to_numpy(dtype=np.float64)
+    lows = dataframe[low_source].to_numpy(dtype=np.float64)
+    length = len(highs)
+
+    if kernels.use_jit(backend):
+        (pivot_points_lows, pivot_points_highs) = kernels.pivot_points_kernel(highs, lows, window)
+        return pd.DataFrame(index=dataframe.index, data={
+            'pivot_lows': pivot_points_lows,
+            'pivot_highs': pivot_points_highs
+        })
+
+    pivot_points_lows = np.full(length, np.nan)
+    pivot_points_highs = np.full(length, np.nan)
 
-    pivot_points_lows = np.empty(len(dataframe['close'])) * np.nan
-    pivot_points_highs = np.empty(len(dataframe['close'])) * np.nan
-    last_values = deque()
-    
     # find pivot points
-    for index, row in enumerate(dataframe.itertuples(index=True, name='Pandas')):
-        last_values.append(row)
-        if len(last_values) >= window * 2 + 1:
-            current_value = last_values[window]
-            is_greater = True
-            is_less = True
-            for window_index in range(0, window):
-                left = last_values[window_index]
-                right = last_values[2 * window - window_index]
-                local_is_greater, local_is_less = check_if_pivot_is_greater_or_less(current_value, high_source, low_source, left, right)
-                is_greater &= local_is_greater
-                is_less &= local_is_less
-            if is_greater:
-                pivot_points_highs[index - window] = getattr(current_value, high_source)
-            if is_less:
-                pivot_points_lows[index - window] = getattr(current_value, low_source)
-            last_values.popleft()
-   
+    # a candle is a pivot when none of the `window` candles on either side goes beyond it,
+    # compare every candidate with its neighbours one offset at a time on shifted views
+    if length >= window * 2 + 1:
+        current_highs = highs[window:length - window]
+        current_lows = lows[window:length - window]
+        is_greater = np.ones(len(current_highs), dtype=bool)
+        is_less = np.ones(len(current_lows), dtype=bool)
+        for offset in range(1, window + 1):
+            left = slice(window - offset, length - window - offset)
+            right = slice(window + offset, length - window + offset)
+            is_greater &= ~((current_highs < highs[left]) | (current_highs < highs[right]))
+            is_less &= ~((current_lows > lows[left]) | (current_lows > lows[right]))
+        pivot_points_highs[window:length - window] = np.where(is_greater, current_highs, np.nan)
+        pivot_points_lows[window:length - window] = np.where(is_less, current_lows, np.nan)
+
     # find last one
-    if len(last_values) >= window + 2:
-        current_value = last_values[-2]
-        is_greater = True
-        is_less = True
-        for window_index in range(0, window):
-            left = last_values[-2 - window_index - 1]
-            right = last_values[-1]
-            local_is_greater, local_is_less = check_if_pivot_is_greater_or_less(current_value, high_source, low_source, left, right)
-            is_greater &= local_is_greater
-            is_less &= local_is_less
-        if is_greater:
-            pivot_points_highs[index - 1] = getattr(current_value, high_source)
-        if is_less:
-            pivot_points_lows[index - 1] = getattr(current_value, low_source)
+    # the candle before the last one only has a single right neighbour
+    if length >= window + 2:
+        current = length - 2
+        neighbours = np.r_[current - window:current, length - 1]
+        if not (highs[current] < highs[neighbours]).any():
+            pivot_points_highs[current] = highs[current]
+        if not (lows[current] > lows[neighbours]).any():
+            pivot_points_lows[current] = lows[current]
 
     return pd.DataFrame(index=dataframe.index, data={
         'pivot_lows': pivot_points_lows,
         'pivot_highs': pivot_points_highs
     })
 
-def check_if_pivot_is_greater_or_less(current_value, high_source: str, low_source: str, left, right) -> Tuple[bool, bool]:
-    is_greater = True
-    is_less = True
-    if (getattr(current_value, high_source) < getattr(left, high_source) or
-        getattr(current_value, high_source) < getattr(right, high_source)):
-        is_greater = False
-
-    if (getattr(current_value, low_source) > getattr(left, low_source) or
-        getattr(current_value, low_source) > getattr(right, low_source)):
-        is_less = False
-    return (is_greater, is_less)
-
-def emaKeltner(dataframe):
-    keltner = {}
-    atr = qtpylib.atr(dataframe, window=10)
-    ema20 = ta.EMA(dataframe, timeperiod=20)
-    keltner['upper'] = ema20 + atr
-    keltner['mid'] = ema20
-    keltner['lower'] = ema20 - atr
-    return keltner
-
-def chaikin_money_flow(dataframe, n=20, fillna=False) -> Series:
-    """Chaikin Money Flow (CMF)
-    It measures the amount of Money Flow Volume over a specific period.
-    http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:chaikin_money_flow_cmf
-    Args:
-        dataframe(pandas.Dataframe): dataframe containing ohlcv
-        n(int): n period.
-        fillna(bool): if True, fill nan values.
-    Returns:
-        pandas.Series: New feature generated.
+class DivergenceState():
+    """
+    Incremental divergence detection of one pair for dry-run / live.
+
+    A candle is committed once a newer candle exists. Committing it decides at most one new
+    pivot of each kind (the candle `window` candles back) and checks only that pivot against
+    the last five pivots of its kind, so the work per new candle does not depend on the length
+    of the history. The newest candle may still change (forming candle), the pivots that depend
+    on it are evaluated again on every update and never committed.
+
+    Replaying a growing dataframe candle by candle gives the same result as
+    divergence_finder_dataframe on the whole frame. On a sliding frame of fixed length, as live
+    trading analyzes, the batch finder no longer sees the pivots that slid out, so only the rows
+    still evaluated (the last window + 1 candles) match, provided the frame holds the last five
+    pivots of each kind; the head rows keep the decisions made with the longer history.
+    Committed decisions are not revisited when older indicator values change later.
     """
-    df = dataframe.copy()
-    mfv = ((df['close'] - df['low']) - (df['high'] - df['close'])) / (df['high'] - df['low'])
-    mfv = mfv.fillna(0.0)  # float division by zero
-    mfv *= df['volume']
-    cmf = (mfv.rolling(n, min_periods=0).sum()
-           / df['volume'].rolling(n, min_periods=0).sum())
-    if fillna:
-        cmf = cmf.replace([np.inf, -np.inf], np.nan).fillna(0)
-    return Series(cmf, name='cmf')
\ No newline at end of file
+
+    def __init__(self, indicator_sources: List[str], window: int = 5, pivot_source: PivotSource = PivotSource.Close):
+        self.indicator_sources = indicator_sources
+        self.window = window
+        (self.high_source, self.low_source) = pivot_source_columns(pivot_source)
+        self.reset()
+
+    def reset(self):
+        # absolute positions count candles from the first one seen after a reset
+        self.committed = 0
+        self.last_date = None
+        self.high_pivots = deque(maxlen=5)
+        self.low_pivots = deque(maxlen=5)
+        # committed (pivot, indicator column, previous pivot) hits and line slots, in absolute positions
+        self.bearish_hits = []
+        self.bullish_hits = []
+        self.bearish_lines = [[] for _ in self.indicator_sources]
+        self.bullish_lines = [[] for _ in self.indicator_sources]
+
+    def update(self, dataframe: DataFrame, divergences: ColumnBuffer) -> Tuple[np.ndarray, list, np.ndarray, list]:
+        """
+        Bring the state up to date with `dataframe` and return the same as divergence_finder_dataframe
+        would for it, the totals are accumulated in the total_* columns of `divergences`.
+        """
+        length = len(dataframe)
+        data = (
+            dataframe['close'].to_numpy(dtype=np.float64),
+            dataframe[self.high_source].to_numpy(dtype=np.float64),
+            dataframe[self.low_source].to_numpy(dtype=np.float64),
+            [dataframe[column].to_numpy(dtype=np.float64) for column in self.indicator_sources],
+        )
+        offset = self.align(dataframe)
+
+        for row in range(self.committed - offset, length - 1):
+            self.commit(data, offset, row)
+        self.last_date = dataframe['date'].iat[self.committed - offset - 1] if self.committed else None
+
+        close = data[0]
+        results = []
+        for (committed_hits, committed_lines, side) in ((self.bearish_hits, self.bearish_lines, 'bearish'),
+                                                        (self.bullish_hits, self.bullish_lines, 'bullish')):
+            provisional_hits = self.provisional_hits(data, offset, length, side == 'bearish')
+            lines = [[list(segments) for segments in slots] for slots in committed_lines]
+            for (index, column, prev_pivot) in provisional_hits:
+                add_divergence_line(lines[column], prev_pivot, index, close[prev_pivot - offset], close[index - offset])
+
+            occurences = np.empty((length, len(self.indicator_sources))) * np.nan
+            total = divergences["total_" + side + "_divergences"]
+            total_count = divergences["total_" + side + "_divergences_count"]
+            total_mask = divergences["total_" + side + "_divergences_mask"]
+            for (index, column, prev_pivot) in committed_hits + provisional_hits:
+                row = index - offset
+                if row < 0:
+                    continue
+                occurences[row, column] = close[row]
+                total[row] = close[row]
+                if row > 30:
+                    total_count[row-30] += 1
+                    total_mask[row-30] |= 1 << column
+            lines = [[[(start - offset, end - offset, start_value, end_value)
+                       for (start, end, start_value, end_value) in segments if start >= offset]
+                      for segments in slots] for slots in lines]
+            results.append((occurences, [[segments for segments in slots if segments] for slots in lines]))
+
+        return (results[0][0], results[0][1], results[1][0], results[1][1])
+
+    def align(self, dataframe: DataFrame) -> int:
+        """Absolute position of the first row of `dataframe`, resets the state when it can not be matched."""
+        if self.committed:
+            position = int(dataframe['date'].searchsorted(self.last_date))
+            if position < len(dataframe) - 1 and dataframe['date'].iat[position] == self.last_date:
+                offset = self.committed - 1 - position
+                self.trim(offset)
+                return offset
+            self.reset()
+        return 0
+
+    def trim(self, offset: int):
+        """Forget hits and lines that ended before the candle at absolute position `offset`."""
+        for hits in (self.bearish_hits, self.bullish_hits):
+            if hits and hits[0][0] < offset:
+                del hits[:bisect.bisect_left(hits, (offset, -1, -1))]
+        for lines in self.bearish_lines + self.bullish_lines:
+            for segments in lines:
+                # keep the last segment, add_divergence_line checks overlaps against it
+                while len(segments) > 1 and segments[0][1] < offset:
+                    segments.pop(0)
+
+    def commit(self, data, offset: int, row: int):
+        center = row - self.window
+        if center >= self.window:
+            neighbours = np.r_[center - self.window:center, center + 1:center + self.window + 1]
+            self.commit_pivot(data, offset, center, neighbours)
+        self.committed = offset + row + 1
+
+    def commit_pivot(self, data, offset: int, center: int, neighbours: np.ndarray):
+        (close, highs, lows, _) = data
+        if not (highs[center] < highs[neighbours]).any():
+            for hit in self.pivot_hits(data, offset, self.high_pivots, center, True):
+                self.bearish_hits.append(hit)
+                add_divergence_line(self.bearish_lines[hit[1]], hit[2], hit[0], close[hit[2] - offset], close[hit[0] - offset])
+            self.high_pivots.append(offset + center)
+        if not (lows[center] > lows[neighbours]).any():
+            for hit in self.pivot_hits(data, offset, self.low_pivots, center, False):
+                self.bullish_hits.append(hit)
+                add_divergence_line(self.bullish_lines[hit[1]], hit[2], hit[0], close[hit[2] - offset], close[hit[0] - offset])
+            self.low_pivots.append(offset + center)
+
+    def provisional_hits(self, data, offset: int, length: int, bearish: bool) -> List[Tuple[int, int, int]]:
+        """Hits of the pivots that depend on the last, uncommitted candle."""
+        values = data[1] if bearish else data[2]
+        pivots = deque(self.high_pivots if bearish else self.low_pivots, maxlen=5)
+        candidates = []
+        center = length - 1 - self.window
+        if center >= self.window:
+            candidates.append((center, np.r_[center - self.window:center, center + 1:center + self.window + 1]))
+        # find last one
+        trailing = length - 2
+        if length >= self.window + 2 and trailing != center:
+            candidates.append((trailing, np.r_[trailing - self.window:trailing, length - 1]))
+
+        hits = []
+        for (candidate, neighbours) in candidates:
+            if bearish:
+                is_pivot = not (values[candidate] < values[neighbours]).any()
+            else:
+                is_pivot = not (values[candidate] > values[neighbours]).any()
+            if is_pivot:
+                hits.extend(self.pivot_hits(data, offset, pivots, candidate, bearish))
+                pivots.append(offset + candidate)
+        return hits
+
+    def pivot_hits(self, data, offset: int, pivots: deque, center: int, bearish: bool) -> List[Tuple[int, int, int]]:
+        """Divergence hits (absolute positions) of the pivot at row `center` against the previous `pivots`."""
+        (close, highs, lows, indicators) = data
+        positions = np.array([pivot - offset for pivot in pivots if pivot >= offset] + [center], dtype=np.int64)
+        first = positions[0]
+        window = slice(first, center + 1)
+        hits = pivot_divergence_hits(close[window], (highs if bearish else lows)[window], positions - first,
+                                     np.column_stack([indicator[window] for indicator in indicators]),
+                                     len(positions) - 1, bearish)
+        return [(offset + first + index, column, offset + first + prev_pivot) for (index, column, prev_pivot) in hits]
@@ -1,16 +1,27 @@
 from datetime import datetime, timedelta
+from functools import cached_property
 import talib.abstract as ta
 import pandas_ta as pta
 from freqtrade.persistence import Trade
 from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
 from freqtrade.strategy import DecimalParameter, IntParameter
-from functools import reduce
+from fqtrade import INDICATOR_CACHE, CandleCache, bank, cached_indicators, indicators, signals
 import warnings
 
 warnings.simplefilter(action="ignore", category=RuntimeWarning)
 
 
+def ema_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    (close,) = indicators.columns(dataframe, 'close')
+    return bank.ema(close, periods)
+
+
+def atr_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    high, low, close = indicators.columns(dataframe, 'high', 'low', 'close')
+    return bank.atr(high, low, close, periods)
+
+
 class MACD(IStrategy):
     minimal_roi = {
         "0": 1
@@ -40,41 +51,64 @@ class MACD(IStrategy):
     atr_sl_rate = DecimalParameter(0.3, 3, default=0.3, decimals=1, space='buy', optimize=True)
     tpsl_rate = DecimalParameter(0.3, 2.6, default=0.3, decimals=2, space='buy', optimize=True)
 
+    @cached_property
+    def candles(self) -> CandleCache:
+        return CandleCache(self.timeframe, ['close', 'atr'])
+
+    @cached_indicators
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         # buy indicators
-        macd = pta.macd(close=dataframe['close'], fast=self.buy_macd_fast_period.value, signal=self.buy_macd_signal_period.value, slow=self.buy_macd_slow_period.value)
-        dataframe['macd'] = macd.iloc[:, 0]
-        dataframe['macd_hist'] = macd.iloc[:, 1]
-        dataframe['macd_signal'] = macd.iloc[:, 2]
         temp = pta.cdl_pattern(name="longline", open_=dataframe['open'], high=dataframe['high'], low=dataframe['low'], close=dataframe['close'])
         dataframe['longline'] = temp
 
-        atr = pta.atr(dataframe['high'], dataframe['low'], dataframe['close'], length=self.tpsl_atr_period.value)
-        dataframe['atr'] = atr
+        return dataframe
+
+    def populate_parameter_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        """
+        Indicators that depend on the buy parameters. Hyperopt runs populate_indicators once
+        and populate_entry_trend every epoch, so they are computed from here, through
+        INDICATOR_CACHE: the period ranges are computed once as banks and every epoch reads
+        its rows.
+        """
+        pair = metadata['pair']
+        # pandas_ta.macd from the EMA banks of every fast / slow period (one bank while both are hyperopted)
+        (fast, slow) = (self.buy_macd_fast_period.value, self.buy_macd_slow_period.value)
+        emas = {
+            fast: INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'EMA', ema_bank,
+                                      bank.parameter_periods(self.buy_macd_fast_period))[fast],
+            slow: INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'EMA', ema_bank,
+                                      bank.parameter_periods(self.buy_macd_slow_period))[slow],
+        }
+        (close,) = indicators.columns(dataframe, 'close')
+        (line, histogram, signal) = bank.macd(close, emas, fast, slow, self.buy_macd_signal_period.value)
+        dataframe['macd'] = line
+        dataframe['macd_hist'] = histogram
+        dataframe['macd_signal'] = signal
+
+        # all tpsl_atr_period periods at once while hyperopting, every epoch reads its row
+        atrs = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'ATR', atr_bank,
+                                   bank.parameter_periods(self.tpsl_atr_period))
+        dataframe['atr'] = atrs[self.tpsl_atr_period.value]
 
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        conditions = []
-        dataframe.loc[:, 'enter_tag'] = ''
+        dataframe = self.populate_parameter_indicators(dataframe, metadata)
+        candles = signals.signal_candles(self, dataframe)
+        conditions = {}
         buy_1 = (
-            (dataframe['longline'] == 100.0) &
-            (dataframe['macd_hist'] > 0)
+            (candles['longline'] == 100.0) &
+            (candles['macd_hist'] > 0)
         )
-        conditions.append(buy_1)
-        dataframe.loc[buy_1, 'enter_tag'] += 'buy_1'
-        if conditions:
-            dataframe.loc[
-                reduce(lambda x, y: x | y, conditions),
-                'enter_long'] = 1
-        # print(dataframe.value_counts())
-        # print(dataframe['enter_long'].value_counts())
-        return dataframe
+        conditions['buy_1'] = buy_1
+        return signals.set_signals(dataframe, candles, conditions, 'enter_long', 'enter_tag')
 
     def custom_exit(self, pair: str, trade: 'Trade', current_time: 'datetime', current_rate: float,
                     current_profit: float, **kwargs):
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair=pair, timeframe=self.timeframe)
-        current_candle = dataframe.iloc[-1].squeeze()
+        current_candle = self.candles.latest(pair, current_time)
+        open_candle = self.candles.at(pair, trade.open_date_utc, current_time)
+        if current_candle is None or open_candle is None:
+            return None
                         
         # if current_time - timedelta(minutes=10) < trade.open_date_utc:
         #     if current_profit >= 0.05:
@@ -104,21 +138,17 @@ class MACD(IStrategy):
             # return "profit_sell
             # "
         if current_profit < 0:
-            time_diff = current_time - trade.open_date_utc
-            delay_bar = int(time_diff.total_seconds() / (60*60))
-            open_candle = dataframe.iloc[-delay_bar] if delay_bar != 0 else current_candle
             if current_candle["close"] < (open_candle["close"]  - open_candle['atr'] * self.atr_sl_rate.value):
                 return "lost_sell"
         
         if current_profit > 0:
-            time_diff = current_time - trade.open_date_utc
-            delay_bar = int(time_diff.total_seconds() / (60*60))
-            open_candle = dataframe.iloc[-delay_bar] if delay_bar != 0 else current_candle
             if current_candle["close"] > (open_candle["close"] + open_candle['atr'] * self.tpsl_rate.value):
                 return "profit_sell"
 
         return None
 
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        dataframe.loc[(), ['exit_long', 'exit_tag']] = (0, 'long_out')
+        # exits all come from custom_exit
+        dataframe['exit_long'] = 0
+        self.candles.capture(metadata['pair'], dataframe)
         return dataframe
\ No newline at end of file
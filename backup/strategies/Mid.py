@@ -1,16 +1,36 @@
 from datetime import datetime, timedelta
+from functools import cached_property
 import talib.abstract as ta
 import pandas_ta as pta
 from freqtrade.persistence import Trade
 from freqtrade.strategy.interface import IStrategy
 from pandas import DataFrame
 from freqtrade.strategy import DecimalParameter, IntParameter
-from functools import reduce
+from fqtrade import INDICATOR_CACHE, CandleCache, bank, indicators, signals
 import warnings
 
 warnings.simplefilter(action="ignore", category=RuntimeWarning)
 
 
+def sma_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    (close,) = indicators.columns(dataframe, 'close')
+    return bank.sma(close, periods)
+
+
+def std_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    (close,) = indicators.columns(dataframe, 'close')
+    return bank.std(close, periods)
+
+
+def supertrend(dataframe: DataFrame, length: int, multiplier: float) -> DataFrame:
+    return pta.supertrend(high=dataframe['high'], low=dataframe['low'], close=dataframe['close'], length=length, multiplier=multiplier)
+
+
+def atr_bank(dataframe: DataFrame, periods: range) -> bank.IndicatorBank:
+    high, low, close = indicators.columns(dataframe, 'high', 'low', 'close')
+    return bank.atr(high, low, close, periods)
+
+
 class Mid(IStrategy):
     minimal_roi = {
         "0": 1
@@ -42,42 +62,60 @@ class Mid(IStrategy):
     atr_sl_rate = DecimalParameter(0.3, 3, default=0.3, decimals=1, space='buy', optimize=True)
     tpsl_rate = DecimalParameter(0.3, 2.6, default=0.3, decimals=2, space='buy', optimize=True)
 
+    @cached_property
+    def candles(self) -> CandleCache:
+        return CandleCache(self.timeframe, ['close', 'atr'])
+
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        # buy indicators
-        bb_bands = pta.bbands(dataframe['close'], length=self.buy_bb_period.value)
-        dataframe['bb_lowerband'] = bb_bands.iloc[:, 0]
-        dataframe['bb_upperband'] = bb_bands.iloc[:, 2]
-        dataframe['bb_middleband'] = bb_bands.iloc[:, 1]
-        dataframe['bb_width'] = bb_bands.iloc[:, 3]
-
-        superT = pta.supertrend(high=dataframe['high'], low=dataframe['low'], close=dataframe['close'], length=self.buy_supertrend_period.value, multiplier=self.buy_supertrend_multiplier.value)
+        return dataframe
+
+    def populate_parameter_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        """
+        Indicators that depend on the buy parameters. Hyperopt runs populate_indicators once
+        and populate_entry_trend every epoch, so they are computed from here, through
+        INDICATOR_CACHE: the period ranges are computed once as banks and every epoch reads
+        its rows, the supertrend is reused by epochs that revisit its parameter values.
+        """
+        pair = metadata['pair']
+        # buy indicators, the bands of pandas_ta.bbands (2 stds) from the banks of every buy_bb_period
+        bb_periods = bank.parameter_periods(self.buy_bb_period)
+        middle = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'SMA', sma_bank, bb_periods)[self.buy_bb_period.value]
+        deviation = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'STD', std_bank, bb_periods)[self.buy_bb_period.value] * 2
+        (lower, upper) = (middle - deviation, middle + deviation)
+        dataframe['bb_lowerband'] = lower
+        dataframe['bb_upperband'] = upper
+        dataframe['bb_middleband'] = middle
+        dataframe['bb_width'] = 100 * (upper - lower) / middle
+
+        superT = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'SUPERTREND', supertrend,
+                                     self.buy_supertrend_period.value, self.buy_supertrend_multiplier.value)
         dataframe['supertrend'] = superT.iloc[:, 1]
 
-        atr = pta.atr(dataframe['high'], dataframe['low'], dataframe['close'], length=self.tpsl_atr_period.value)
-        dataframe['atr'] = atr
+        # all tpsl_atr_period periods at once while hyperopting, every epoch reads its row
+        atrs = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'ATR', atr_bank,
+                                   bank.parameter_periods(self.tpsl_atr_period))
+        dataframe['atr'] = atrs[self.tpsl_atr_period.value]
 
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        conditions = []
-        dataframe.loc[:, 'enter_tag'] = ''
+        dataframe = self.populate_parameter_indicators(dataframe, metadata)
+        candles = signals.signal_candles(self, dataframe)
+        conditions = {}
         buy_1 = (
-            (dataframe['close'] < dataframe['bb_middleband']) &
-            (dataframe['supertrend'] == 1) &
-            (dataframe['bb_width'] > self.buy_bb_width_value.value)
+            (candles['close'] < candles['bb_middleband']) &
+            (candles['supertrend'] == 1) &
+            (candles['bb_width'] > self.buy_bb_width_value.value)
         )
-        conditions.append(buy_1)
-        dataframe.loc[buy_1, 'enter_tag'] += 'buy_1'
-        if conditions:
-            dataframe.loc[
-                reduce(lambda x, y: x | y, conditions),
-                'enter_long'] = 1
-        return dataframe
+        conditions['buy_1'] = buy_1
+        return signals.set_signals(dataframe, candles, conditions, 'enter_long', 'enter_tag')
 
     def custom_exit(self, pair: str, trade: 'Trade', current_time: 'datetime', current_rate: float,
                     current_profit: float, **kwargs):
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair=pair, timeframe=self.timeframe)
-        current_candle = dataframe.iloc[-1].squeeze()
+        current_candle = self.candles.latest(pair, current_time)
+        open_candle = self.candles.at(pair, trade.open_date_utc, current_time)
+        if current_candle is None or open_candle is None:
+            return None
                         
         # if current_time - timedelta(minutes=10) < trade.open_date_utc:
         #     if current_profit >= 0.05:
@@ -107,21 +145,17 @@ class Mid(IStrategy):
             # return "profit_sell
             # "
         if current_profit < 0:
-            time_diff = current_time - trade.open_date_utc
-            delay_bar = int(time_diff.total_seconds() / (60*15))
-            open_candle = dataframe.iloc[-delay_bar] if delay_bar != 0 else current_candle
             if current_candle["close"] < (open_candle["close"]  - open_candle['atr'] * self.atr_sl_rate.value):
                 return "lost_sell"
         
         if current_profit > 0:
-            time_diff = current_time - trade.open_date_utc
-            delay_bar = int(time_diff.total_seconds() / (60*15))
-            open_candle = dataframe.iloc[-delay_bar] if delay_bar != 0 else current_candle
             if current_candle["close"] > (open_candle["close"] + open_candle['atr'] * self.tpsl_rate.value):
                 return "profit_sell"
 
         return None
 
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        dataframe.loc[(), ['exit_long', 'exit_tag']] = (0, 'long_out')
+        # exits all come from custom_exit
+        dataframe['exit_long'] = 0
+        self.candles.capture(metadata['pair'], dataframe)
         return dataframe
\ No newline at end of file
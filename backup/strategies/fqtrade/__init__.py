@@ -0,0 +1,8 @@
+# Shared helpers for the strategies in this directory.
+# Freqtrade puts the strategy directory on sys.path while loading a strategy,
+# so strategies import these as `from fqtrade import ...`.
+from fqtrade.candles import CandleCache, CandleIndex
+from fqtrade.columns import ColumnBuffer, LazyColumns
+from fqtrade.diskcache import IndicatorStore, cached_indicators
+from fqtrade.memo import INDICATOR_CACHE, IndicatorCache
+from fqtrade.trades import TradeLevels, closes_trade
@@ -0,0 +1,194 @@
+"""
+Indicators for a whole range of periods at once.
+
+Hyperopted periods (e.g. an ATR period from 5 to 60) need the same indicator for every
+period of the range. The functions here compute them together into one C-contiguous
+(periods x candles) float64 array and share the work that does not depend on the period:
+one cumulative sum gives every SMA, std and recursion seed, one true range feeds every ATR
+and one set of gains / losses every RSI. The recursions of EMA, ATR and RSI and the rolling
+std run in a single Numba kernel when Numba is installed (see fqtrade.kernels). The kernels
+give TA-Lib's values up to float rounding (TA-Lib builds themselves differ in the last bit),
+a single period always comes from TA-Lib.
+
+Without Numba only the SMA is shared; EMA, ATR, RSI and std fall back to one TA-Lib call per
+period, so a bank costs as much as computing every period on its own and only pays off
+through the cache, when later hyperopt epochs take their rows from it.
+
+    atrs = bank.atr(high, low, close, bank.parameter_periods(self.tpsl_atr_period))
+    dataframe['atr'] = atrs[self.tpsl_atr_period.value]
+"""
+from typing import Dict, Iterable, Mapping, Tuple
+
+import numpy as np
+import talib
+from freqtrade.strategy import IntParameter
+
+from fqtrade import kernels
+from fqtrade.indicators import true_range
+
+
+class IndicatorBank():
+    """
+    One indicator for several periods, a row per period of a read-only (periods x candles)
+    array. bank[period] is a view of that row, so picking a period copies nothing.
+    """
+
+    def __init__(self, periods: np.ndarray, values: np.ndarray):
+        self.periods = tuple(int(period) for period in periods)
+        self.values = values
+        self.values.flags.writeable = False
+        self.rows: Dict[int, int] = {period: row for (row, period) in enumerate(self.periods)}
+
+    def __getitem__(self, period: int) -> np.ndarray:
+        return self.values[self.rows[period]]
+
+    def __contains__(self, period: int) -> bool:
+        return period in self.rows
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+def parameter_periods(parameter: IntParameter) -> range:
+    """
+    Every period of `parameter` while it is hyperopted, so that each epoch takes its row from
+    the same (cached) bank, otherwise just its value.
+    """
+    if parameter.in_space and parameter.optimize:
+        return range(parameter.low, parameter.high + 1)
+    return range(parameter.value, parameter.value + 1)
+
+
+def period_array(periods: Iterable[int]) -> np.ndarray:
+    periods = np.fromiter(periods, dtype=np.int64)
+    if len(periods) == 0 or periods.min() < 1:
+        raise ValueError(f"Periods must be a non empty range of positive integers, got {periods.tolist()}")
+    return periods
+
+
+def use_kernels(periods: np.ndarray, backend: str) -> bool:
+    """
+    The Numba kernels only pay off for several periods; a single one (backtesting, live)
+    goes straight to TA-Lib and keeps its values bit for bit.
+    """
+    return len(periods) > 1 and kernels.use_jit(backend)
+
+
+def empty_rows(periods: np.ndarray, length: int) -> np.ndarray:
+    # np.empty: every row is written once, with its NaN head, instead of filled first
+    return np.empty((len(periods), length))
+
+
+def window_sums(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Rolling sums for every period from a single cumulative sum, NaN until a window is full."""
+    sums = np.r_[0.0, np.cumsum(values, dtype=np.float64)]
+    out = empty_rows(periods, len(values))
+    for (row, period) in enumerate(periods):
+        out[row, :period - 1] = np.nan
+        if period <= len(values):
+            np.subtract(sums[period:], sums[:-period], out=out[row, period - 1:])
+    return out
+
+
+def seeds(values: np.ndarray, start: int, periods: np.ndarray) -> np.ndarray:
+    """Mean of the first `period` values from `start` for every period, from one cumulative sum."""
+    sums = np.r_[0.0, np.cumsum(values[start:], dtype=np.float64)]
+    means = np.full(len(periods), np.nan)
+    fits = periods < len(sums)
+    means[fits] = sums[periods[fits]] / periods[fits]
+    return means
+
+
+def smoothing(values: np.ndarray, start: int, periods: np.ndarray, alphas: np.ndarray) -> np.ndarray:
+    """
+    Rows of exponential smoothing seeded, like TA-Lib, with the mean of the first `period`
+    values from `start` (leading NaNs are skipped, as the TA-Lib wrapper does).
+    """
+    finite = np.flatnonzero(~np.isnan(values[start:]))
+    start += int(finite[0]) if len(finite) else len(values)
+    out = empty_rows(periods, len(values))
+    kernels.smoothing_rows_kernel(values, start, periods, alphas, seeds(values, start, periods), out)
+    return out
+
+
+def sma(values: np.ndarray, periods: Iterable[int]) -> IndicatorBank:
+    periods = period_array(periods)
+    if len(periods) == 1:
+        return IndicatorBank(periods, talib.SMA(values, timeperiod=int(periods[0]))[None, :])
+    out = window_sums(values, periods)
+    out /= periods[:, None]
+    return IndicatorBank(periods, out)
+
+
+def std(values: np.ndarray, periods: Iterable[int], ddof: int = 0, backend: str = 'auto') -> IndicatorBank:
+    """
+    Rolling standard deviation; ddof=0 like ta.STDDEV and pandas_ta.bbands, ddof=1 like
+    pandas' rolling().std(). Sums of squares are kept per window (a cumulative sum of them
+    over the whole history loses the precision of small deviations of large prices).
+    """
+    periods = period_array(periods)
+    if use_kernels(periods, backend):
+        out = empty_rows(periods, len(values))
+        kernels.rolling_std_rows_kernel(values, periods, ddof, out)
+        return IndicatorBank(periods, out)
+    return IndicatorBank(periods, np.stack([talib.STDDEV(values, timeperiod=int(period)) * np.sqrt(period / (period - ddof))
+                                            for period in periods]))
+
+
+def ema(values: np.ndarray, periods: Iterable[int], backend: str = 'auto') -> IndicatorBank:
+    periods = period_array(periods)
+    if use_kernels(periods, backend):
+        return IndicatorBank(periods, smoothing(values, 0, periods, 2.0 / (periods + 1)))
+    return IndicatorBank(periods, np.stack([talib.EMA(values, timeperiod=int(period)) for period in periods]))
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, periods: Iterable[int],
+        backend: str = 'auto') -> IndicatorBank:
+    """Wilder's ATR (ta.ATR); the first candle has no previous close and is left out, like TA-Lib does."""
+    periods = period_array(periods)
+    if use_kernels(periods, backend):
+        return IndicatorBank(periods, smoothing(true_range(high, low, close), 1, periods, 1.0 / periods))
+    return IndicatorBank(periods, np.stack([talib.ATR(high, low, close, timeperiod=int(period))
+                                            for period in periods]))
+
+
+def rsi(close: np.ndarray, periods: Iterable[int], backend: str = 'auto') -> IndicatorBank:
+    """Wilder's RSI (ta.RSI)."""
+    periods = period_array(periods)
+    if not use_kernels(periods, backend):
+        return IndicatorBank(periods, np.stack([talib.RSI(close, timeperiod=int(period)) for period in periods]))
+
+    changes = np.diff(close, prepend=np.nan)
+    gains = np.fmax(changes, 0.0)
+    losses = -np.fmin(changes, 0.0)
+    out = empty_rows(periods, len(close))
+    kernels.rsi_rows_kernel(gains, losses, periods, seeds(gains, 1, periods), seeds(losses, 1, periods), out)
+    return IndicatorBank(periods, out)
+
+
+def macd(close: np.ndarray, emas: Mapping[int, np.ndarray], fast: int, slow: int,
+         signal: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    TA-Lib's MACD, histogram and signal (the columns of pandas_ta.macd) from the ta.EMA rows
+    of the fast and slow period, e.g. of an ema() bank.
+    TA-Lib starts its fast EMA at the first slow EMA value, seeded with the mean of the last
+    `fast` closes there; from then on it follows the same recursion as the ta.EMA row, so the
+    two only differ by the seed difference, decaying by (1 - alpha) per candle.
+    """
+    (fast, slow) = (min(fast, slow), max(fast, slow))
+    start = slow - 1
+    line = np.full(len(close), np.nan)
+    if start < len(close):
+        row = emas[fast]
+        decay = np.power(1.0 - 2.0 / (fast + 1), np.arange(len(close) - start))
+        decay *= close[slow - fast:slow].mean() - row[start]
+        decay += row[start:]
+        np.subtract(decay, emas[slow][start:], out=line[start:])
+    signal_line = talib.EMA(line, timeperiod=signal)
+    # TA-Lib leaves the MACD line empty until its signal starts too
+    line[:start + signal - 1] = np.nan
+    return (line, line - signal_line, signal_line)
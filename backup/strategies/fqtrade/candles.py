@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from freqtrade.exchange import timeframe_to_seconds
+from pandas import DataFrame
+
+
+def epoch_ns(dates) -> np.ndarray:
+    """Candle dates as int64 nanoseconds since epoch (UTC)."""
+    return pd.DatetimeIndex(dates).as_unit('ns').asi8
+
+
+class CandleIndex():
+    """
+    Per-pair lookup of analyzed candles by their open date.
+
+    The open dates of every pair are kept as one sorted int64 array that is only extended
+    when new candles show up, so finding the candle of a date is a binary search instead of
+    a backwards scan over the dataframe. This works with the full dataframe of dry-run/live
+    as well as with the sliding window that get_analyzed_dataframe returns in backtesting.
+    """
+
+    def __init__(self):
+        self.pairs: Dict[str, np.ndarray] = {}
+
+    def update(self, pair: str, dataframe: DataFrame) -> int:
+        """Sync the cached dates of `pair` with `dataframe`, return the position of its first row in them."""
+        dates = self.pairs.get(pair)
+        first = pd.Timestamp(dataframe['date'].iat[0]).value
+        if dates is not None:
+            start = int(np.searchsorted(dates, first))
+            end = start + len(dataframe)
+            if start < len(dates) and dates[start] == first:
+                if end <= len(dates) and dates[end - 1] == pd.Timestamp(dataframe['date'].iat[-1]).value:
+                    return start
+                overlap = len(dates) - start
+                if end > len(dates) and dates[-1] == pd.Timestamp(dataframe['date'].iat[overlap - 1]).value:
+                    # new candles were appended, drop the ones that left the window
+                    dates = np.concatenate((dates[start:], epoch_ns(dataframe['date'].iloc[overlap:])))
+                    self.pairs[pair] = dates
+                    return 0
+        self.pairs[pair] = epoch_ns(dataframe['date'])
+        return 0
+
+    def position(self, pair: str, dataframe: DataFrame, date: datetime) -> int:
+        """Row position of the candle opened at `date` in `dataframe`, -1 when there is none."""
+        if len(dataframe) == 0:
+            return -1
+        start = self.update(pair, dataframe)
+        dates = self.pairs[pair]
+        target = pd.Timestamp(date).value
+        index = int(np.searchsorted(dates, target, side='left'))
+        if index >= len(dates) or dates[index] != target or not start <= index < start + len(dataframe):
+            return -1
+        return index - start
+
+    def row(self, pair: str, dataframe: DataFrame, date: datetime, columns: List[str],
+            offset: int = 0) -> Optional[dict]:
+        """
+        Values of `columns` in the candle `offset` rows away from the one opened at `date`,
+        without building a Series for the row. None when that candle is not in `dataframe`.
+        """
+        position = self.position(pair, dataframe, date)
+        if position < 0 or not 0 <= position + offset < len(dataframe):
+            return None
+        return {column: dataframe[column].iat[position + offset] for column in columns}
+
+
+class CandleCache():
+    """
+    Per-pair snapshot of a few columns of the analyzed dataframe, for callbacks that only read
+    the latest candle.
+
+    capture() copies the columns into NumPy arrays once per analysis (call it at the end of
+    populate_exit_trend, which sees the same dataframe get_analyzed_dataframe returns later).
+    latest() then finds the candle get_analyzed_dataframe would end with at `current_time`
+    from the timestamp alone: the one before the candle `current_time` falls into, so it is
+    correct for the sliding window of backtesting and for detail timeframes as well. The row
+    is built once as a dict of plain Python values and shared by all trades of the pair until
+    the next candle, instead of a dataframe.iloc[-1].squeeze() Series per call.
+    """
+
+    def __init__(self, timeframe: str, columns: List[str]):
+        self.timeframe_ns = timeframe_to_seconds(timeframe) * 10**9
+        self.columns = columns
+        self.pairs: Dict[str, Tuple[np.ndarray, Dict[str, np.ndarray]]] = {}
+        self.latest_rows: Dict[str, Tuple[int, dict]] = {}
+
+    def capture(self, pair: str, dataframe: DataFrame):
+        """Take the columns of a freshly analyzed dataframe of `pair`."""
+        self.pairs[pair] = (epoch_ns(dataframe['date']),
+                            {column: dataframe[column].to_numpy() for column in self.columns})
+        self.latest_rows.pop(pair, None)
+
+    def position(self, pair: str, date: datetime) -> int:
+        """Position of the last captured candle opened at or before `date`, -1 when there is none."""
+        return self._search(pair, pd.Timestamp(date).value)
+
+    def _search(self, pair: str, date_ns: int) -> int:
+        if pair not in self.pairs:
+            return -1
+        return int(np.searchsorted(self.pairs[pair][0], date_ns, side='right')) - 1
+
+    def at(self, pair: str, date: datetime, current_time: datetime) -> Optional[dict]:
+        """
+        The candle `date` falls into (e.g. a trade's open date), or the last closed candle when
+        that one has not closed yet at `current_time`. With missing candles, the one before.
+        """
+        position = min(self.position(pair, date), self.last_closed(pair, current_time))
+        if position < 0:
+            return None
+        return self.row(pair, position)
+
+    def row(self, pair: str, position: int) -> dict:
+        """Values of the captured columns in the candle at `position`."""
+        return {column: values[position].item() for (column, values) in self.pairs[pair][1].items()}
+
+    def last_closed(self, pair: str, current_time: datetime) -> int:
+        """Position of the last closed candle at `current_time`, -1 when nothing was captured for `pair` yet."""
+        now = int(current_time.timestamp()) * 10**9
+        return self._search(pair, now - now % self.timeframe_ns - self.timeframe_ns)
+
+    def latest(self, pair: str, current_time: datetime) -> Optional[dict]:
+        """The last closed candle at `current_time`, None when nothing was captured for `pair` yet."""
+        position = self.last_closed(pair, current_time)
+        if position < 0:
+            return None
+        cached = self.latest_rows.get(pair)
+        if cached is None or cached[0] != position:
+            cached = (position, self.row(pair, position))
+            self.latest_rows[pair] = cached
+        return cached[1]
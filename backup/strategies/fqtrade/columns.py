@@ -0,0 +1,101 @@
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from freqtrade.strategy import IntParameter
+from pandas import DataFrame
+
+from fqtrade.bank import parameter_periods
+from fqtrade.memo import INDICATOR_CACHE, IndicatorCache
+
+
+class ColumnBuffer():
+    """
+    Array backed columns for strategies that fill indicators inside per-row loops.
+
+    Write into the arrays returned by add() with plain NumPy indexing while looping,
+    then call commit() once to insert every buffered column into the dataframe in a
+    single block, instead of a pandas __setitem__ (and possible copy) per value.
+
+        totals = ColumnBuffer(dataframe)
+        count = totals.add('count', 0, dtype=np.int64)
+        for index in ...:
+            count[index] += 1
+        totals.commit()
+    """
+
+    def __init__(self, dataframe: DataFrame):
+        self.dataframe = dataframe
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def add(self, name: str, fill_value=np.nan, dtype=np.float64) -> np.ndarray:
+        """Create a buffered column filled with `fill_value` and return its array."""
+        column = np.full(len(self.dataframe), fill_value, dtype=dtype)
+        self.columns[name] = column
+        return column
+
+    def __setitem__(self, name: str, values):
+        if len(values) != len(self.dataframe):
+            raise ValueError(f"Column {name} has {len(values)} values, expected {len(self.dataframe)}")
+        self.columns[name] = np.asarray(values)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def commit(self) -> DataFrame:
+        """Insert all buffered columns into the dataframe at once and empty the buffer."""
+        if self.columns:
+            self.dataframe[list(self.columns)] = DataFrame(self.columns, index=self.dataframe.index)
+        self.columns = {}
+        return self.dataframe
+
+
+class LazyColumns():
+    """
+    Indicator columns named `<prefix>_<period>` that are only computed when a strategy asks
+    for them, instead of one column per value of a parameter range in populate_indicators.
+
+    provide() adds the named columns that are missing from the dataframe. The results are
+    kept in an IndicatorCache (LRU, bounded in bytes), so hyperopt epochs that come back to a
+    period reuse them and the dataframes hyperopt stores and reloads stay small.
+
+        def ema(dataframe, period):
+            return ta.EMA(dataframe, timeperiod=period)
+
+        self.lazy_columns = LazyColumns(self.timeframe, {'ema': ema})
+        self.lazy_columns.provide(dataframe, metadata['pair'], f"ema_{self.ema_period.value}")
+        dataframe[f"ema_{self.ema_period.value}"]
+
+    The providers of the prefixes in `banks` take a range of periods instead and return an
+    IndicatorBank (see fqtrade.bank): the first column of such a prefix computes every period
+    its IntParameter can take, the other ones are rows of that bank.
+    """
+
+    def __init__(self, timeframe: str, providers: Dict[str, Callable[[DataFrame, int], object]],
+                 cache: IndicatorCache = INDICATOR_CACHE, banks: Optional[Dict[str, IntParameter]] = None):
+        self.timeframe = timeframe
+        self.providers = providers
+        self.cache = cache
+        self.banks = banks or {}
+
+    def provide(self, dataframe: DataFrame, pair: str, *names: str) -> DataFrame:
+        for name in names:
+            if name in dataframe.columns:
+                continue
+            (prefix, _, period) = name.rpartition('_')
+            if prefix not in self.providers or not period.isdigit():
+                raise KeyError(f"No lazy column provider for {name}, expected <prefix>_<period> "
+                               f"with a prefix in {list(self.providers)}")
+            provider = self.providers[prefix]
+            period = int(period)
+            # keyed by the provider, not the prefix: prefixes sharing a provider share the results
+            if prefix in self.banks:
+                periods = parameter_periods(self.banks[prefix])
+                if period not in periods:
+                    periods = range(period, period + 1)
+                dataframe[name] = self.cache.get(dataframe, pair, self.timeframe, provider, provider, periods)[period]
+            else:
+                dataframe[name] = self.cache.get(dataframe, pair, self.timeframe, provider, provider, period)
+        return dataframe
@@ -0,0 +1,194 @@
+"""
+On-disk cache of populate_indicators results for backtesting, hyperopt and plotting.
+
+Results are keyed by pair, timeframe, a hash of the dataframe the strategy is given, a hash
+of the strategy source (its own, its base classes' and the fqtrade helpers'), the values of
+its parameters and the versions of the indicator libraries, so a rerun on unchanged data and
+code loads the indicators instead of computing them. Files are uncompressed Arrow IPC
+(feather v2) in user_data/indicator_cache, read through a memory map; the least recently
+used ones are deleted once the directory grows past its size cap.
+
+    @cached_indicators
+    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+
+Only for populate_indicators that depend on nothing but the dataframe and the parameters
+(no state kept on the strategy, no data fetched from the DataProvider). Off unless the config
+enables it, as it writes up to max_size_mb under user_data:
+
+    "indicator_cache": {"enabled": true, "max_size_mb": 2048}
+"""
+import hashlib
+import logging
+import os
+import sys
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from freqtrade.enums import RunMode
+from pandas import DataFrame
+
+
+logger = logging.getLogger(__name__)
+
+CACHED_RUNMODES = (RunMode.BACKTEST, RunMode.HYPEROPT, RunMode.PLOT)
+DIRECTORY = 'indicator_cache'
+MAX_SIZE_MB = 2048
+LIBRARIES = ('freqtrade', 'numpy', 'pandas', 'talib', 'pandas_ta', 'technical')
+FQTRADE = Path(__file__).resolve().parent
+
+_source_digests: Dict[type, Optional[str]] = {}
+
+
+def frame_digest(dataframe: DataFrame) -> str:
+    """Hash of the column names, dtypes and values of `dataframe`."""
+    digest = hashlib.blake2b(digest_size=16)
+    for (name, column) in dataframe.items():
+        digest.update(f"{name}:{column.dtype}".encode())
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biufM':
+            values = column.to_numpy()
+            digest.update(np.ascontiguousarray(values.view(np.int64) if values.dtype.kind == 'M' else values).data)
+        elif isinstance(column.dtype, pd.DatetimeTZDtype):
+            digest.update(pd.DatetimeIndex(column).asi8.data)
+        else:
+            digest.update(pd.util.hash_pandas_object(column, index=False).to_numpy().data)
+    return digest.hexdigest()
+
+
+def source_digest(strategy_class: type) -> Optional[str]:
+    """Hash of the source of the strategy, its base classes and fqtrade; None when a source is not found."""
+    if strategy_class not in _source_digests:
+        sources = []
+        for cls in strategy_class.__mro__:
+            module = sys.modules.get(cls.__module__)
+            if cls.__module__.split('.')[0] in ('freqtrade', 'builtins', 'abc'):
+                continue
+            # freqtrade's resolver does not register strategy modules, it sets __file__ on the class
+            path = getattr(module, '__file__', None) or cls.__dict__.get('__file__')
+            if path is None:
+                _source_digests[strategy_class] = None
+                return None
+            sources.append(Path(path))
+        sources.extend(sorted(FQTRADE.glob('*.py')))
+        digest = hashlib.blake2b(digest_size=16)
+        for path in dict.fromkeys(sources):
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        _source_digests[strategy_class] = digest.hexdigest()
+    return _source_digests[strategy_class]
+
+
+def library_versions() -> str:
+    return ','.join(f"{name}={getattr(sys.modules.get(name), '__version__', None)}" for name in LIBRARIES)
+
+
+def indicator_key(strategy, dataframe: DataFrame, metadata: dict) -> Optional[str]:
+    code = source_digest(type(strategy))
+    if code is None:
+        return None
+    parameters = sorted((name, repr(parameter.value), parameter.in_space and parameter.optimize)
+                        for (name, parameter) in strategy.enumerate_parameters())
+    key = hashlib.blake2b(digest_size=20)
+    for part in (metadata['pair'], strategy.timeframe, type(strategy).__name__, frame_digest(dataframe),
+                 code, repr(parameters), library_versions()):
+        key.update(f"{part}\x00".encode())
+    return key.hexdigest()
+
+
+class IndicatorStore():
+    """Dataframes stored as uncompressed feather files in `directory`, at most `max_bytes` in total."""
+
+    def __init__(self, directory: Path, max_bytes: int = MAX_SIZE_MB * 2**20):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.feather"
+
+    def load(self, key: str) -> Optional[DataFrame]:
+        path = self.path(key)
+        try:
+            dataframe = feather.read_table(path, memory_map=True).to_pandas()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pa.ArrowException) as error:
+            logger.warning(f"Dropping unreadable indicator cache file {path}: {error}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        # mark as recently used for evict()
+        os.utime(path)
+        self.hits += 1
+        return dataframe
+
+    def store(self, key: str, dataframe: DataFrame):
+        path = self.path(key)
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            feather.write_feather(dataframe.reset_index(drop=True), temporary, compression='uncompressed')
+            os.replace(temporary, path)
+        except (OSError, ValueError, TypeError, pa.ArrowException) as error:
+            logger.debug(f"Indicators not cached on disk: {error}")
+            temporary.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used files until the directory fits in max_bytes."""
+        files = []
+        for path in self.directory.glob('*.feather'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for (_, size, _) in files)
+        for (_, size, path) in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def indicator_store(strategy) -> Optional[IndicatorStore]:
+    """The store of the strategy, None unless the cache is enabled and the run mode is cached."""
+    config = strategy.config
+    settings = config.get('indicator_cache', {})
+    if not settings.get('enabled', False) or config.get('runmode') not in CACHED_RUNMODES:
+        return None
+    store = getattr(strategy, '_indicator_store', None)
+    if store is None:
+        directory = Path(config.get('user_data_dir', 'user_data')) / DIRECTORY
+        store = IndicatorStore(directory, int(settings.get('max_size_mb', MAX_SIZE_MB) * 2**20))
+        strategy._indicator_store = store
+    return store
+
+
+def cached_indicators(populate_indicators: Callable) -> Callable:
+    """Decorator for populate_indicators, loads the result from an IndicatorStore when one matches."""
+
+    @wraps(populate_indicators)
+    def wrapper(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        store = indicator_store(self)
+        key = indicator_key(self, dataframe, metadata) if store is not None else None
+        if key is None:
+            return populate_indicators(self, dataframe, metadata)
+
+        cached = store.load(key)
+        if cached is not None and len(cached) == len(dataframe):
+            logger.debug(f"Indicators of {metadata['pair']} loaded from {store.path(key)}")
+            cached.index = dataframe.index
+            return cached
+        dataframe = populate_indicators(self, dataframe, metadata)
+        store.store(key, dataframe)
+        return dataframe
+
+    return wrapper
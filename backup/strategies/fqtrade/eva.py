@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from functools import cached_property
+
+import numpy as np
+import talib.abstract as ta
+from freqtrade.persistence import Trade
+from freqtrade.strategy import DecimalParameter, IntParameter
+from freqtrade.strategy.interface import IStrategy
+from pandas import DataFrame
+
+from fqtrade.candles import CandleCache
+from fqtrade.memo import INDICATOR_CACHE
+
+
+class EVAStrategy(IStrategy):
+    """
+    Exit rules shared by EVA1, EVA2, BOLT and RSI_F; subclasses add the 'fastk' (STOCHF 5, 3)
+    and 'cci' (CCI 20) columns with populate_exit_indicators() in populate_indicators. Both are
+    shared through INDICATOR_CACHE, so strategies running side by side compute them once.
+
+    populate_exit_trend turns the candle conditions into boolean columns for all candles at
+    once, so custom_exit is left with the profit / trade age checks and reads the flags of the
+    last closed candle from a CandleCache, instead of building a pandas Series of it on every call.
+    custom_exit_rows() applies the same checks to a run of candles for fqtrade.exits.
+    """
+    sell_fastx = IntParameter(50, 100, default=70, space='sell', optimize=True)
+
+    sell_loss_cci = IntParameter(low=0, high=600, default=148, space='sell', optimize=False)
+    sell_loss_cci_profit = DecimalParameter(-0.15, 0, default=-0.04, decimals=2, space='sell', optimize=False)
+    sell_cci = IntParameter(low=0, high=200, default=90, space='sell', optimize=False)
+
+    @cached_property
+    def exit_candles(self) -> CandleCache:
+        return CandleCache(self.timeframe, ['high', 'fastk_exit', 'cci_exit', 'cci_loss_exit'])
+
+    def populate_exit_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        pair = metadata['pair']
+        stoch_fast = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'STOCHF', ta.STOCHF, 5, 3, 0, 3, 0)
+        dataframe['fastk'] = stoch_fast['fastk']
+        dataframe['cci'] = INDICATOR_CACHE.get(dataframe, pair, self.timeframe, 'CCI', ta.CCI, timeperiod=20)
+        return dataframe
+
+    def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        dataframe['fastk_exit'] = dataframe['fastk'] > self.sell_fastx.value
+        dataframe['cci_exit'] = dataframe['cci'] > self.sell_cci.value
+        dataframe['cci_loss_exit'] = dataframe['cci'] > self.sell_loss_cci.value
+        self.exit_candles.capture(metadata['pair'], dataframe)
+
+        # exits all come from custom_exit
+        dataframe['exit_long'] = 0
+        return dataframe
+
+    def custom_exit(self, pair: str, trade: 'Trade', current_time: 'datetime', current_rate: float,
+                    current_profit: float, **kwargs):
+        if current_time - timedelta(minutes=10) < trade.open_date_utc:
+            if current_profit >= 0.05:
+                return "profit_sell_fast"
+
+        candle = self.exit_candles.latest(pair, current_time)
+        if candle is None:
+            return None
+
+        if current_profit > 0:
+            if candle['fastk_exit']:
+                return "fastk_profit_sell"
+
+            if candle['cci_exit']:
+                return "cci_profit_sell"
+
+        if current_time - timedelta(hours=2) > trade.open_date_utc:
+            if current_profit > 0:
+                return "profit_sell_in_2h"
+
+        if candle['high'] >= trade.open_rate:
+            if candle['cci_exit']:
+                return "cci_sell"
+
+        if current_profit > self.sell_loss_cci_profit.value:
+            if candle['cci_loss_exit']:
+                return "cci_loss_sell"
+
+        return None
+
+    def custom_exit_rows(self, candles, open_rate: float, current_profit: np.ndarray,
+                         minutes: np.ndarray) -> np.ndarray:
+        """
+        custom_exit at consecutive candles of one trade: `candles` holds the columns of the
+        last closed candle at each of them, `minutes` the trade age. '' where it returns None.
+        """
+        in_profit = current_profit > 0
+        conditions = [
+            (minutes < 10) & (current_profit >= 0.05),
+            in_profit & candles['fastk_exit'],
+            in_profit & candles['cci_exit'],
+            (minutes > 120) & in_profit,
+            (candles['high'] >= open_rate) & candles['cci_exit'],
+            (current_profit > self.sell_loss_cci_profit.value) & candles['cci_loss_exit'],
+        ]
+        reasons = ['profit_sell_fast', 'fastk_profit_sell', 'cci_profit_sell', 'profit_sell_in_2h', 'cci_sell',
+                   'cci_loss_sell']
+        return np.select(conditions, reasons, default='')
@@ -0,0 +1,219 @@
+"""
+freqtrade hyperopt of the roi / stoploss / trailing spaces on fqtrade.exits.ExitSimulator.
+
+Takes the arguments of `freqtrade hyperopt` and searches the same spaces with the same sampler
+and loss function, but the signals are analyzed once and every epoch replays the trades only.
+Run it from the strategies directory, e.g. for the EVA2 line of docker-compose.yml:
+
+    cd /freqtrade/user_data/strategies
+    python -m fqtrade.exit_hyperopt --config /freqtrade/user_data/config.json \\
+        --hyperopt-loss QuickHyperOptLoss --strategy EVA2 -e 500 --spaces trailing stoploss roi
+
+Epochs run one after the other (-j is ignored) and nothing is written: the best parameters are
+printed as the strategy json has them. The simulator leaves out a few things freqtrade models
+(see fqtrade.exits), so confirm them with freqtrade backtesting before using them.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections.abc import Mapping
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import optuna
+from freqtrade.commands import Arguments
+from freqtrade.configuration import Configuration
+from freqtrade.data.converter import trim_dataframes
+from freqtrade.data.history import get_timerange
+from freqtrade.data.metrics import calculate_market_change
+from freqtrade.enums import RunMode
+from freqtrade.misc import round_dict
+from freqtrade.optimize.backtesting import Backtesting
+from freqtrade.optimize.hyperopt.hyperopt_auto import HyperOptAuto
+from freqtrade.optimize.hyperopt.hyperopt_optimizer import INITIAL_POINTS, MAX_LOSS, optuna_samplers_dict
+from freqtrade.optimize.hyperopt_tools import HyperoptTools
+from freqtrade.optimize.optimize_reports import generate_strategy_stats
+from freqtrade.resolvers.hyperopt_resolver import HyperOptLossResolver
+from freqtrade.util import dt_now
+from pandas import DataFrame
+
+from fqtrade import kernels
+from fqtrade.exits import ExitSimulator
+
+
+SPACES = ('roi', 'stoploss', 'trailing')
+
+
+def exit_spaces(config: dict) -> List[str]:
+    """The spaces of config['spaces'], ValueError for the ones that change the signals."""
+    others = [space for space in config['spaces'] if space not in SPACES]
+    if others:
+        raise ValueError(f"The {', '.join(others)} space(s) change the signals, run them with freqtrade hyperopt")
+    return [space for space in SPACES if HyperoptTools.has_space(config, space)]
+
+
+def optuna_sampler(hyperopt: HyperOptAuto, dimensions: list, random_state: int):
+    """The sampler freqtrade hyperopt uses (HyperOptimizer.get_optimizer)."""
+    sampler = hyperopt.generate_estimator(dimensions=dimensions, random_state=random_state)
+    if not isinstance(sampler, str):
+        return sampler
+    if sampler not in optuna_samplers_dict:
+        raise ValueError(f"Optuna sampler {sampler} is not supported")
+    if sampler in ('NSGAIISampler', 'NSGAIIISampler'):
+        return optuna_samplers_dict[sampler](seed=random_state, population_size=INITIAL_POINTS)
+    if sampler in ('GPSampler', 'TPESampler', 'CmaEsSampler'):
+        return optuna_samplers_dict[sampler](seed=random_state, n_startup_trials=INITIAL_POINTS)
+    return optuna_samplers_dict[sampler](seed=random_state)
+
+
+def explanation(results: DataFrame, starting_balance: float, stake_currency: str) -> str:
+    """HyperoptTools.format_results_explanation_string() from the trades, without the stats."""
+    profits = results['profit_abs']
+    total = profits.sum()
+    return (f"{len(results):6d} trades. {(profits > 0).sum()}/{(profits == 0).sum()}/{(profits < 0).sum()} "
+            f"Wins/Draws/Losses. Avg profit {results['profit_ratio'].mean():7.2%}. "
+            f"Median profit {results['profit_ratio'].median():7.2%}. "
+            f"Total profit {total:11.8f} {stake_currency} ({total / starting_balance:8.2%}). "
+            f"Avg duration {timedelta(minutes=round(results['trade_duration'].mean()))} min.")
+
+
+class LazyStats(Mapping):
+    """
+    generate_strategy_stats() of an epoch, computed when something first reads it: most loss
+    functions only look at the trades, and the stats cost more than the simulation.
+    """
+
+    def __init__(self, compute: Callable[[], Dict[str, Any]]):
+        self.compute = compute
+        self.stats: Optional[Dict[str, Any]] = None
+
+    def resolve(self) -> Dict[str, Any]:
+        if self.stats is None:
+            self.stats = self.compute()
+        return self.stats
+
+    def __getitem__(self, key: str) -> Any:
+        return self.resolve()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.resolve())
+
+    def __len__(self) -> int:
+        return len(self.resolve())
+
+
+class ExitHyperopt():
+    """The search of a `freqtrade hyperopt` run over the exit spaces, on one analysis of the data."""
+
+    def __init__(self, config: dict, backend: str = 'auto'):
+        self.config = config
+        self.spaces = exit_spaces(config)
+        self.backtesting = Backtesting(config)
+        self.backtesting._set_strategy(self.backtesting.strategylist[0])
+        self.strategy = self.backtesting.strategy
+        self.pairlist = self.backtesting.pairlists.whitelist
+        self.hyperopt = HyperOptAuto(config)
+        self.hyperopt.strategy = self.strategy
+        self.calculate_loss = HyperOptLossResolver.load_hyperoptloss(config).hyperopt_loss_function
+
+        (data, timerange) = self.backtesting.load_bt_data()
+        self.processed = self.strategy.advise_all_indicators(data)
+        trimmed = trim_dataframes(self.processed, timerange, self.backtesting.required_startup)
+        (self.min_date, self.max_date) = get_timerange(trimmed)
+        self.market_change = calculate_market_change(trimmed, 'close')
+        self.simulator = ExitSimulator(self.strategy, self.processed, timerange, fee=self.backtesting.fee,
+                                       startup_candles=self.backtesting.required_startup, backend=backend)
+
+    def dimensions(self) -> list:
+        spaces = {'roi': self.hyperopt.roi_space, 'stoploss': self.hyperopt.stoploss_space,
+                  'trailing': self.hyperopt.trailing_space}
+        return [dimension for space in self.spaces for dimension in spaces[space]()]
+
+    def apply(self, params: Dict[str, Any]):
+        """Set the strategy's settings like HyperOptimizer.generate_optimizer()."""
+        if 'roi' in self.spaces:
+            self.strategy.minimal_roi = self.hyperopt.generate_roi_table(params)
+        if 'stoploss' in self.spaces:
+            self.strategy.stoploss = params['stoploss']
+        if 'trailing' in self.spaces:
+            for (name, value) in self.hyperopt.generate_trailing_params(params).items():
+                setattr(self.strategy, name, value)
+
+    def details(self, params: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """The parameters of each space as the strategy json has them."""
+        details: Dict[str, Dict[str, Any]] = {}
+        if 'roi' in self.spaces:
+            details['roi'] = {str(minutes): ratio for (minutes, ratio) in self.hyperopt.generate_roi_table(params).items()}
+        if 'stoploss' in self.spaces:
+            details['stoploss'] = {'stoploss': params['stoploss']}
+        if 'trailing' in self.spaces:
+            details['trailing'] = self.hyperopt.generate_trailing_params(params)
+        return {space: round_dict(values, 13) for (space, values) in details.items()}
+
+    def epoch(self, params: Dict[str, Any]) -> Tuple[float, DataFrame]:
+        """Loss of `params` (MAX_LOSS below --min-trades) and the trades of their backtest."""
+        start = dt_now()
+        self.apply(params)
+        content = self.simulator.simulate()
+        content.update({'backtest_start_time': int(start.timestamp()),
+                        'backtest_end_time': int(dt_now().timestamp())})
+        stats = LazyStats(lambda: generate_strategy_stats(
+            self.pairlist, self.strategy.get_strategy_name(), content, self.min_date, self.max_date,
+            market_change=self.market_change, is_hyperopt=True))
+
+        trade_count = len(content['results'])
+        if trade_count < self.config['hyperopt_min_trades']:
+            return (MAX_LOSS, content['results'])
+        loss = self.calculate_loss(
+            results=content['results'], trade_count=trade_count, min_date=self.min_date, max_date=self.max_date,
+            config=self.config, processed=self.processed, backtest_stats=stats,
+            starting_balance=self.simulator.starting_balance)
+        return (loss, content['results'])
+
+    def run(self) -> Optional[Dict[str, Any]]:
+        """Run the epochs and print each improvement, returns the best epoch (None when all are MAX_LOSS)."""
+        random_state = self.config.get('hyperopt_random_state') or random.randint(1, 2**16 - 1)
+        dimensions = self.dimensions()
+        study = optuna.create_study(sampler=optuna_sampler(self.hyperopt, dimensions, random_state),
+                                    direction='minimize')
+        distributions = {dimension.name: dimension for dimension in dimensions}
+        epochs = self.config['epochs']
+        best = None
+        start = time.perf_counter()
+        for epoch in range(1, epochs + 1):
+            trial = study.ask(distributions)
+            (loss, results) = self.epoch(trial.params)
+            study.tell(trial, loss)
+            if loss < MAX_LOSS and (best is None or loss < best['loss']):
+                best = {'epoch': epoch, 'loss': loss, 'params': trial.params}
+                print(f"{epoch:5d}/{epochs}: "
+                      f"{explanation(results, self.simulator.starting_balance, self.config['stake_currency'])} "
+                      f"Objective: {loss:.5f}")
+        seconds = time.perf_counter() - start
+        print(f"{epochs} epochs in {seconds:.1f}s ({epochs / seconds:.1f} epochs/s), random state {random_state}")
+        return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0], allow_abbrev=False,
+                                     epilog="The other arguments are the ones of freqtrade hyperopt.")
+    parser.add_argument('--backend', choices=kernels.BACKENDS, default='auto',
+                        help="scan of the trades, the Numba kernel or NumPy (default: %(default)s)")
+    (options, hyperopt_args) = parser.parse_known_args(argv)
+    args = Arguments(['hyperopt', *hyperopt_args]).get_parsed_arg()
+    config = Configuration(args, RunMode.HYPEROPT).get_config()
+
+    search = ExitHyperopt(config, options.backend)
+    best = search.run()
+    if best is None:
+        print(f"No epoch with at least {config['hyperopt_min_trades']} trades")
+        return 1
+    print(f"Best epoch {best['epoch']}, objective {best['loss']:.5f}:")
+    print(json.dumps(search.details(best['params']), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
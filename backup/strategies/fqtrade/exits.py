@@ -0,0 +1,450 @@
+"""
+Vectorized backtest of the roi / stoploss / trailing settings of a strategy.
+
+Hyperopt over the roi, stoploss and trailing spaces alone (docker-compose.yml runs EVA2 and
+RSI_F that way) leaves every signal as it is, yet freqtrade runs the whole candle by candle
+backtest again each epoch. ExitSimulator analyzes the candles once, simulate() then replays
+the trades only: the entries in the order of the backtest loop, bounded by max_open_trades
+and the wallet, and for each trade a forward scan over NumPy arrays of its candles, with the
+trailing stop as a running maximum of the highs and the ROI of each candle looked up in the
+table. Exit signals and custom_exit do not depend on these settings, so the first of them
+after an entry candle is found once and reused by every epoch. With Numba installed the scan of
+a trade runs in a compiled kernel (fqtrade.kernels), the NumPy windows otherwise.
+
+The trades follow freqtrade's backtesting: market entries at the open of the candle after the
+signal, the exits of should_exit() in its order (exit signal / custom_exit, stoploss, ROI,
+trailing stoploss) at the close rates of Backtesting._get_close_rate(), and the stake of the
+backtest wallet ('unlimited' too). Only long trades without leverage; price / amount
+precision, exchange stake limits, funding fees, protections and timeframe_detail are not
+modelled, so confirm the best epochs with freqtrade backtesting. A strategy with a custom_exit
+has to provide custom_exit_rows(), the same rules over arrays of candles (see EVAStrategy).
+
+    simulator = ExitSimulator(strategy, preprocessed, timerange, fee=0.001)
+    strategy.minimal_roi = {0: 0.05, 30: 0.01}
+    results = simulator.simulate()['results']
+"""
+import heapq
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from freqtrade.configuration import TimeRange
+from freqtrade.constants import UNLIMITED_STAKE_AMOUNT
+from freqtrade.data.btanalysis import BT_DATA_COLUMNS
+from freqtrade.data.converter import trim_dataframe
+from freqtrade.enums import ExitType
+from freqtrade.exchange import timeframe_to_minutes
+from freqtrade.strategy.interface import IStrategy
+from freqtrade.util import get_dry_run_wallet
+from pandas import DataFrame
+
+from fqtrade import kernels
+from fqtrade.candles import epoch_ns
+from fqtrade.indicators import columns
+
+
+NS_PER_MINUTE = 60_000_000_000
+NS_PER_MS = 1_000_000
+# close date of the trades still open at the end, they keep their slot and stake until then
+OPEN_AT_END = sys.maxsize
+# candles scanned first for the exit of a trade, the window doubles until the exit is found
+FIRST_WINDOW = 32
+
+# exit reasons of the kinds exit_scan_kernel returns
+SCAN_REASONS = (None, ExitType.STOP_LOSS.value, ExitType.ROI.value, ExitType.TRAILING_STOP_LOSS.value)
+
+# the values of ExitSimulator.trade(), results have BT_DATA_COLUMNS in freqtrade's order
+TRADE_COLUMNS = ('pair', 'stake_amount', 'max_stake_amount', 'amount', 'open_date', 'close_date', 'open_rate',
+                 'close_rate', 'fee_open', 'fee_close', 'trade_duration', 'profit_ratio', 'profit_abs', 'exit_reason',
+                 'initial_stop_loss_abs', 'initial_stop_loss_ratio', 'stop_loss_abs', 'stop_loss_ratio', 'min_rate',
+                 'max_rate', 'is_open', 'enter_tag', 'leverage', 'is_short', 'open_timestamp', 'close_timestamp',
+                 'orders', 'funding_fees')
+
+UNSUPPORTED_SETTINGS = ('can_short', 'position_adjustment_enable', 'use_custom_stoploss', 'use_custom_roi')
+UNSUPPORTED_CALLBACKS = ('confirm_trade_entry', 'confirm_trade_exit', 'custom_stake_amount', 'custom_entry_price',
+                         'custom_exit_price', 'leverage')
+
+
+def overridden(strategy: IStrategy, name: str) -> bool:
+    return getattr(type(strategy), name) is not getattr(IStrategy, name)
+
+
+def check_strategy(strategy: IStrategy):
+    """Raise ValueError when `strategy` relies on something ExitSimulator does not model."""
+    unsupported = [name for name in UNSUPPORTED_SETTINGS if getattr(strategy, name, False)]
+    unsupported += [name for name in UNSUPPORTED_CALLBACKS if overridden(strategy, name)]
+    if overridden(strategy, 'custom_exit') and not hasattr(strategy, 'custom_exit_rows'):
+        unsupported.append('custom_exit without custom_exit_rows')
+    if unsupported:
+        raise ValueError(f"{strategy.get_strategy_name()} uses {', '.join(unsupported)}, "
+                         f"which the exit simulator does not model")
+
+
+def profit_ratios(rates: np.ndarray, open_rate: float, fee: float) -> np.ndarray:
+    """calc_profit_ratio() at `rates` of a long trade opened at `open_rate`."""
+    return np.round(rates * (1 - fee) / (open_rate * (1 + fee)) - 1, 8)
+
+
+def signal_values(dataframe: DataFrame, name: str) -> np.ndarray:
+    if name not in dataframe:
+        return np.zeros(len(dataframe), dtype=bool)
+    return dataframe[name].to_numpy(dtype=np.float64, na_value=np.nan) == 1
+
+
+def tag_values(dataframe: DataFrame, name: str) -> np.ndarray:
+    if name not in dataframe:
+        return np.full(len(dataframe), None, dtype=object)
+    return dataframe[name].to_numpy(dtype=object, na_value=None)
+
+
+class PairExits():
+    """
+    The candles of one pair as the backtest loop sees them: the analyzed, trimmed dataframe
+    without its first candle, every candle carrying the signals of the one before.
+    """
+
+    def __init__(self, pair: str, dataframe: DataFrame):
+        self.pair = pair
+        self.dataframe = dataframe
+        self.dates = epoch_ns(dataframe['date'])[1:]
+        self.minutes = self.dates // NS_PER_MINUTE
+        (self.open, self.high, self.low) = (values[1:] for values in columns(dataframe, 'open', 'high', 'low'))
+        self.enter = signal_values(dataframe, 'enter_long')[:-1]
+        self.exit = signal_values(dataframe, 'exit_long')[:-1]
+        self.enter_tags = tag_values(dataframe, 'enter_tag')[:-1]
+        self.exit_tags = tag_values(dataframe, 'exit_tag')[:-1]
+        self.previous_columns: Dict[str, np.ndarray] = {}
+        # entry candle -> (candle of the first exit signal / custom_exit, exit reason)
+        self.signal_exits: Dict[int, Tuple[int, Optional[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def previous(self, name: str) -> np.ndarray:
+        """Column `name` of the last closed candle at each candle."""
+        values = self.previous_columns.get(name)
+        if values is None:
+            values = self.dataframe[name].to_numpy()[:-1]
+            self.previous_columns[name] = values
+        return values
+
+
+class PreviousCandles():
+    """The columns of the last closed candle at the candles [start, stop) of a pair, for custom_exit_rows()."""
+
+    def __init__(self, pair: PairExits, start: int, stop: int):
+        self.pair = pair
+        self.start = start
+        self.stop = stop
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.pair.previous(name)[self.start:self.stop]
+
+
+class ExitRules():
+    """The roi / stoploss / trailing settings of a strategy, read once per simulation."""
+
+    def __init__(self, strategy: IStrategy, fee: float):
+        roi = sorted((int(minutes), float(ratio)) for (minutes, ratio) in strategy.minimal_roi.items())
+        self.roi_minutes = np.array([minutes for (minutes, _) in roi], dtype=np.int64)
+        self.roi_ratios = np.array([ratio for (_, ratio) in roi])
+        self.stoploss = abs(strategy.stoploss)
+        self.trailing_stop = strategy.trailing_stop
+        self.trailing_stop_positive = strategy.trailing_stop_positive
+        self.trailing_stop_positive_offset = strategy.trailing_stop_positive_offset
+        self.trailing_only_offset_is_reached = strategy.trailing_only_offset_is_reached
+        self.positive = np.nan if self.trailing_stop_positive is None else abs(self.trailing_stop_positive)
+        self.offset = self.trailing_stop_positive_offset or 0.0
+        self.ignore_roi_if_entry_signal = strategy.ignore_roi_if_entry_signal
+        self.timeframe_minutes = timeframe_to_minutes(strategy.timeframe)
+        self.fee = fee
+
+    def roi_entries(self, minutes: np.ndarray) -> np.ndarray:
+        """Position in the ROI table of the entry in effect after `minutes`, -1 before the first one."""
+        return np.searchsorted(self.roi_minutes, minutes, side='right') - 1
+
+    def trailing_ratios(self, best: np.ndarray) -> np.ndarray:
+        """Stoploss ratio the trailing stop follows the high with at each candle, NaN where it stays."""
+        ratios = np.full(len(best), self.stoploss)
+        if self.trailing_stop_positive is not None:
+            ratios[best > self.offset] = self.positive
+        if self.trailing_only_offset_is_reached:
+            ratios[best < self.offset] = np.nan
+        return ratios
+
+
+class ExitSimulator():
+    """
+    Replays the trades of `strategy` on `preprocessed` (advise_all_indicators() of the
+    backtest data) with the roi / stoploss / trailing settings the strategy has at each
+    simulate() call, max_open_trades and the stake come from the strategy and its config.
+    `backend` picks the scan of the trades like fqtrade.bank ('auto', 'numpy' or 'numba').
+    """
+
+    def __init__(self, strategy: IStrategy, preprocessed: Dict[str, DataFrame], timerange: TimeRange,
+                 fee: float, startup_candles: Optional[int] = None, backend: str = 'auto'):
+        check_strategy(strategy)
+        self.jit = kernels.use_jit(backend)
+        self.strategy = strategy
+        self.config = strategy.config
+        self.fee = fee
+        self.custom_exit = overridden(strategy, 'custom_exit')
+        self.starting_balance = get_dry_run_wallet(self.config)
+        if startup_candles is None:
+            startup_candles = strategy.startup_candle_count
+
+        self.pairs: List[PairExits] = []
+        for (pair, dataframe) in preprocessed.items():
+            analyzed = strategy.ft_advise_signals(dataframe.copy(), {'pair': pair})
+            trimmed = trim_dataframe(analyzed, timerange, startup_candles=startup_candles)
+            if len(trimmed) > 1:
+                self.pairs.append(PairExits(pair, trimmed))
+        self.entries = self.entry_candles()
+
+    def entry_candles(self) -> Tuple[List[int], List[int], List[int]]:
+        """(date, pair, candle) of every entry signal, in the order the backtest loop visits them."""
+        if not self.pairs:
+            return ([], [], [])
+        # no entries on the last candle of the backtest
+        end = max(pair.dates[-1] for pair in self.pairs)
+        (dates, pairs, candles) = ([], [], [])
+        for (index, pair) in enumerate(self.pairs):
+            entries = np.flatnonzero(pair.enter & ~pair.exit & (pair.dates < end))
+            dates.append(pair.dates[entries])
+            pairs.append(np.full(len(entries), index))
+            candles.append(entries)
+        (dates, pairs, candles) = (np.concatenate(values) for values in (dates, pairs, candles))
+        order = np.lexsort((pairs, dates))
+        return (dates[order].tolist(), pairs[order].tolist(), candles[order].tolist())
+
+    def signal_exit(self, pair: PairExits, entry: int) -> Tuple[int, Optional[str]]:
+        """First candle from `entry` on with an exit signal or custom_exit and its reason, len(pair) when none."""
+        found = pair.signal_exits.get(entry)
+        if found is not None:
+            return found
+        found = (len(pair), None)
+        strategy = self.strategy
+        if strategy.use_exit_signal:
+            open_rate = pair.open[entry]
+            (start, window) = (entry, FIRST_WINDOW)
+            while start < len(pair):
+                stop = min(start + window, len(pair))
+                exits = pair.exit[start:stop] & ~pair.enter[start:stop]
+                profits = profit_ratios(pair.open[start:stop], open_rate, self.fee)
+                fired = exits & (profits > strategy.exit_profit_offset) if strategy.exit_profit_only else exits
+                if self.custom_exit:
+                    reasons = np.asarray(strategy.custom_exit_rows(
+                        PreviousCandles(pair, start, stop), open_rate, profits,
+                        pair.minutes[start:stop] - pair.minutes[entry]))
+                    fired = fired | (~exits & (reasons != ''))
+                if fired.any():
+                    candle = int(np.argmax(fired))
+                    if exits[candle]:
+                        reason = pair.exit_tags[start + candle] or ExitType.EXIT_SIGNAL.value
+                    else:
+                        reason = str(reasons[candle])
+                    found = (start + candle, reason)
+                    break
+                (start, window) = (stop, window * 2)
+        pair.signal_exits[entry] = found
+        return found
+
+    def stop_or_roi(self, pair: PairExits, entry: int, end: int, rules: ExitRules) -> tuple:
+        """
+        Scan the candles [entry, end] of a trade for its stoploss and ROI, the exit signal on
+        `end` (if any) goes first there. Returns (candle, exit reason, stop, stop ratio) of the
+        exit, candle None when neither of them exits.
+        """
+        if self.jit:
+            (candle, kind, stop, stop_ratio) = kernels.exit_scan_kernel(
+                pair.open, pair.high, pair.low, pair.minutes, pair.enter, entry, end, self.fee, rules.stoploss,
+                rules.trailing_stop, rules.positive, rules.offset, rules.trailing_only_offset_is_reached,
+                rules.roi_minutes, rules.roi_ratios, rules.ignore_roi_if_entry_signal)
+            return (candle if candle >= 0 else None, SCAN_REASONS[kind], stop, stop_ratio)
+
+        open_rate = pair.open[entry]
+        initial = stop = open_rate * (1 - rules.stoploss)
+        stop_ratio = rules.stoploss
+        last = min(end, len(pair) - 1)
+        (start, window) = (entry, FIRST_WINDOW)
+        while start <= last:
+            until = min(start + window, last + 1)
+            (high, low) = (pair.high[start:until], pair.low[start:until])
+            best = profit_ratios(high, open_rate, self.fee)
+            if rules.trailing_stop:
+                ratios = rules.trailing_ratios(best)
+                raised = high * (1 - ratios)
+                stops = np.fmax.accumulate(np.fmax(raised, stop))
+                previous = np.concatenate(([stop], stops[:-1]))
+                # the stop only follows the high when the previous one was not hit
+                stops_used = np.where(previous >= low, previous, stops)
+            else:
+                stops_used = np.full(until - start, stop)
+            hits = stops_used >= low
+            roi_entries = rules.roi_entries(pair.minutes[start:until] - pair.minutes[entry])
+            roi_hits = (roi_entries >= 0) & (best > rules.roi_ratios[roi_entries] if len(rules.roi_ratios)
+                                             else np.zeros(until - start, dtype=bool))
+            if rules.ignore_roi_if_entry_signal:
+                roi_hits &= ~pair.enter[start:until]
+            hits |= roi_hits
+            if end < len(pair) and until > end:
+                hits[end - start] = False
+
+            candle = int(np.argmax(hits)) if hits.any() else until - start - 1
+            used = stops_used[candle]
+            if used > stop:
+                # raised in this window, by the first candle that reached it
+                stop_ratio = ratios[int(np.argmax(raised[:candle + 1] == used))]
+            stop = used
+            if hits[candle]:
+                if used >= low[candle]:
+                    if used <= initial:
+                        return (start + candle, ExitType.STOP_LOSS.value, stop, stop_ratio)
+                    if not roi_hits[candle]:
+                        return (start + candle, ExitType.TRAILING_STOP_LOSS.value, stop, stop_ratio)
+                return (start + candle, ExitType.ROI.value, stop, stop_ratio)
+            (start, window) = (until, window * 2)
+        return (None, None, stop, stop_ratio)
+
+    def exit_rate(self, pair: PairExits, entry: int, index: int, reason: str, stop: float, stop_ratio: float,
+                  rules: ExitRules) -> float:
+        """Close rate of a stoploss / ROI exit on candle `index`."""
+        if reason == ExitType.STOP_LOSS.value:
+            return pair.open[index] if stop > pair.high[index] else stop
+        minutes = int(pair.minutes[index] - pair.minutes[entry])
+        if reason == ExitType.ROI.value:
+            return self.roi_rate(pair, index, pair.open[entry], minutes, int(rules.roi_entries(minutes)), rules)
+        return self.trailing_rate(pair, index, stop, stop_ratio, minutes, rules)
+
+    def roi_rate(self, pair: PairExits, index: int, open_rate: float, minutes: int, roi_entry: int,
+                 rules: ExitRules) -> float:
+        """Backtesting._get_close_rate_for_roi() of a long trade."""
+        (entry_minutes, roi) = (rules.roi_minutes[roi_entry], rules.roi_ratios[roi_entry])
+        if roi == -1 and entry_minutes % rules.timeframe_minutes == 0:
+            return pair.open[index]
+        rate = (1 + roi) * open_rate * (1 + self.fee) / (1 - self.fee)
+        if minutes > 0 and minutes == entry_minutes and entry_minutes % rules.timeframe_minutes == 0 \
+                and pair.open[index] > rate:
+            # a new ROI entry starting with the candle
+            return pair.open[index]
+        return min(max(rate, pair.low[index]), pair.high[index])
+
+    def trailing_rate(self, pair: PairExits, index: int, stop: float, stop_ratio: float, minutes: int,
+                      rules: ExitRules) -> float:
+        """Backtesting._get_close_rate_for_stoploss() of a trailing stop of a long trade."""
+        if stop > pair.high[index]:
+            return pair.open[index]
+        if minutes != 0:
+            return stop
+        # raised and hit on the entry candle, assume the worst
+        if rules.trailing_only_offset_is_reached and rules.trailing_stop_positive_offset is not None \
+                and rules.trailing_stop_positive:
+            rate = pair.open[index] * (1 + abs(rules.trailing_stop_positive_offset) - abs(rules.trailing_stop_positive))
+        else:
+            rate = pair.open[index] * (1 - abs(stop_ratio))
+        return max(pair.low[index], rate)
+
+    def stake_amount(self, tied_up: float, closed_profit: float, max_open_trades: float) -> float:
+        """Wallets.get_trade_stake_amount() and validate_stake_amount() of the backtest wallet, 0 for no trade."""
+        config = self.config
+        free = self.starting_balance + closed_profit - tied_up
+        if 'available_capital' in config:
+            total = config['available_capital'] + closed_profit
+        else:
+            total = (tied_up + free) * config['tradable_balance_ratio']
+        available = min(total - tied_up, free)
+
+        stake = config['stake_amount']
+        if stake == UNLIMITED_STAKE_AMOUNT:
+            if max_open_trades == 0:
+                return 0
+            stake = min((available + tied_up) / max_open_trades, available)
+        if config.get('amend_last_stake_amount', False):
+            if available > stake * config.get('last_stake_amount_min_ratio', 0.5):
+                stake = min(stake, available)
+            else:
+                stake = 0
+        if available < stake or stake <= 0:
+            return 0
+        return min(stake, available)
+
+    def trade(self, pair: PairExits, entry: int, stake: float, rules: ExitRules) -> tuple:
+        """The trade entered on candle `entry`, its TRADE_COLUMNS."""
+        (signal_candle, reason) = self.signal_exit(pair, entry)
+        (candle, stop_reason, stop, stop_ratio) = self.stop_or_roi(pair, entry, signal_candle, rules)
+        if candle is None:
+            if signal_candle < len(pair):
+                (candle, rate) = (signal_candle, pair.open[signal_candle])
+            else:
+                (candle, rate, reason) = (len(pair) - 1, pair.open[len(pair) - 1], ExitType.FORCE_EXIT.value)
+        else:
+            (rate, reason) = (self.exit_rate(pair, entry, candle, stop_reason, stop, stop_ratio, rules), stop_reason)
+
+        fee = self.fee
+        # Python floats, NumPy scalars are slower to compute with
+        (open_rate, rate) = (float(pair.open[entry]), float(rate))
+        amount = stake / open_rate
+        open_value = amount * open_rate * (1 + fee)
+        profit_abs = round(amount * rate * (1 - fee) - open_value, 8)
+        # freqtrade reports the closed trade's profit over its open value, unrounded
+        profit_ratio = profit_abs / open_value
+        (open_date, close_date) = (pair.dates[entry], pair.dates[candle])
+        return (
+            pair.pair, stake, stake, amount, open_date, close_date, open_rate, rate, fee, fee,
+            int((close_date - open_date) // NS_PER_MINUTE), profit_ratio, profit_abs, reason,
+            open_rate * (1 - rules.stoploss), -rules.stoploss, float(stop), -abs(float(stop_ratio)),
+            min(open_rate, float(pair.low[entry:candle + 1].min())), max(open_rate, float(pair.high[entry:candle + 1].max())),
+            False, pair.enter_tags[entry], 1.0, False, open_date // NS_PER_MS, close_date // NS_PER_MS, [], 0.0,
+        )
+
+    def simulate(self) -> dict:
+        """Backtest the current roi / stoploss / trailing settings, returns what Backtesting.backtest() does."""
+        rules = ExitRules(self.strategy, self.fee)
+        max_open_trades = self.strategy.max_open_trades
+        # (close date, stake, profit) of the open trades, by close date
+        open_trades: List[Tuple[int, float, float]] = []
+        busy_until = [-1] * len(self.pairs)
+        (tied_up, closed_profit, rejected) = (0.0, 0.0, 0)
+        trades = []
+        for (date, index, entry) in zip(*self.entries):
+            if busy_until[index] >= date:
+                continue
+            # trades closing on this candle do so before the entries of the pairs without a trade
+            while open_trades and open_trades[0][0] <= date:
+                (_, stake, profit) = heapq.heappop(open_trades)
+                tied_up -= stake
+                closed_profit += profit
+            if 0 < max_open_trades <= len(open_trades):
+                rejected += 1
+                continue
+            stake = self.stake_amount(tied_up, closed_profit, max_open_trades)
+            if not stake:
+                continue
+
+            pair = self.pairs[index]
+            trade = self.trade(pair, entry, stake, rules)
+            close_date = trade[5] if trade[13] != ExitType.FORCE_EXIT.value else OPEN_AT_END
+            busy_until[index] = close_date
+            heapq.heappush(open_trades, (close_date, stake, trade[12]))
+            tied_up += stake
+            trades.append(trade)
+
+        # freqtrade lists the trades as they close
+        trades.sort(key=lambda trade: trade[5])
+        results = DataFrame.from_records(trades, columns=TRADE_COLUMNS).reindex(columns=BT_DATA_COLUMNS)
+        if len(results):
+            results['open_date'] = pd.to_datetime(results['open_timestamp'], unit='ms', utc=True)
+            results['close_date'] = pd.to_datetime(results['close_timestamp'], unit='ms', utc=True)
+        return {
+            'results': results,
+            'config': self.config,
+            'locks': [],
+            'rejected_signals': rejected,
+            'timedout_entry_orders': 0,
+            'timedout_exit_orders': 0,
+            'canceled_trade_entries': 0,
+            'canceled_entry_orders': 0,
+            'replaced_entry_orders': 0,
+            'final_balance': self.starting_balance + float(results['profit_abs'].sum()),
+        }
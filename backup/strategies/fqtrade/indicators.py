@@ -0,0 +1,113 @@
+"""
+Indicators computed on NumPy views of the OHLCV columns.
+
+Every function takes and returns plain float64 arrays, so nothing here copies the
+dataframe; fetch the inputs once with columns() and assign the results back.
+
+    high, low, close, volume = indicators.columns(dataframe, 'high', 'low', 'close', 'volume')
+    dataframe['cmf'] = indicators.chaikin_money_flow(high, low, close, volume, 20)
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import talib
+from pandas import DataFrame
+
+
+ATR_MODES = ('sma', 'wilder')
+
+
+def columns(dataframe: DataFrame, *names: str) -> Tuple[np.ndarray, ...]:
+    """Return the named columns as float64 arrays, viewing (not copying) float64 columns."""
+    return tuple(dataframe[name].to_numpy(dtype=np.float64, copy=False) for name in names)
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    Sum over the last `window` values, from a single cumulative sum.
+    NaNs are skipped like pandas rolling(window, min_periods).sum(): a row is NaN when its
+    window holds fewer than `min_periods` (default `window`) values.
+    """
+    min_periods = window if min_periods is None else min_periods
+    missing = np.isnan(values)
+    if not missing.any():
+        sums = np.cumsum(values, dtype=np.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        if min_periods > 1:
+            sums[:min_periods - 1] = np.nan
+        return sums
+
+    # a NaN would stay in the cumulative sum for good, sum zeros and count the valid values
+    sums = np.cumsum(np.where(missing, 0.0, values), dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.cumsum(~missing, dtype=np.int64)
+    counts[window:] = counts[window:] - counts[:-window]
+    sums[counts < min_periods] = np.nan
+    return sums
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average, NaN until `window` values are available (like qtpylib.rolling_mean)."""
+    means = rolling_sum(values, window)
+    means /= window
+    return means
+
+
+def typical_price(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    price = high + low
+    price += close
+    price /= 3.0
+    return price
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range; the first row has no previous close and is just high - low (like qtpylib.true_range)."""
+    ranges = high - low
+    previous_close = close[:-1]
+    np.fmax(ranges[1:], np.abs(high[1:] - previous_close), out=ranges[1:])
+    np.fmax(ranges[1:], np.abs(low[1:] - previous_close), out=ranges[1:])
+    return ranges
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14, mode: str = 'sma',
+        ranges: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Average true range.
+    mode='sma' averages the true range like qtpylib.atr(exp=False); pass `ranges` to reuse a
+    true_range() already computed for another window.
+    mode='wilder' is Wilder's smoothing, the same values as ta.ATR and pandas_ta.atr.
+    """
+    if mode == 'sma':
+        return rolling_mean(true_range(high, low, close) if ranges is None else ranges, window)
+    if mode == 'wilder':
+        return talib.ATR(high, low, close, timeperiod=window)
+    raise ValueError(f"Unknown ATR mode {mode}, expected one of {ATR_MODES}")
+
+
+def keltner_channel(mid: np.ndarray, atr: np.ndarray, atrs: float = 1) -> Dict[str, np.ndarray]:
+    """Bands `atrs` ATRs around an already computed middle line (e.g. an EMA)."""
+    width = atr * atrs if atrs != 1 else atr
+    return {
+        'upper': mid + width,
+        'mid': mid,
+        'lower': mid - width,
+    }
+
+
+def chaikin_money_flow(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                       window: int = 20) -> np.ndarray:
+    """
+    Chaikin Money Flow (CMF)
+    It measures the amount of Money Flow Volume over a specific period.
+    http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:chaikin_money_flow_cmf
+    Rows before the first full window use the candles available so far.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flow = close - low
+        flow -= high - close
+        flow /= high - low
+        flow[np.isnan(flow)] = 0.0  # float division by zero
+        flow *= volume
+        cmf = rolling_sum(flow, window, min_periods=0)
+        cmf /= rolling_sum(volume, window, min_periods=0)
+    return cmf
@@ -0,0 +1,241 @@
+"""
+Optional Numba compiled kernels for the sequential parts of the divergence pipeline, of
+the indicator bank and of the exit simulator.
+
+The kernels work on plain float64/int64 arrays and mirror the NumPy implementations in
+HarmonicDivergence (and the TA-Lib recursions, for fqtrade.bank, and
+ExitSimulator.stop_or_roi, for fqtrade.exits) value for value. Numba is not part of the freqtrade image, when it is
+missing NUMBA_AVAILABLE is False and callers stay on the NumPy code (see use_jit).
+Compiled kernels are cached on disk in NUMBA_CACHE_DIR, which defaults to a numba_cache
+directory next to the strategies directory (user_data/numba_cache in the container), so
+compilation is paid once.
+"""
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+os.environ.setdefault('NUMBA_CACHE_DIR', str(Path(__file__).resolve().parents[2] / 'numba_cache'))
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ('auto', 'numpy', 'numba')
+_fallback_logged = False
+
+
+def use_jit(backend: str) -> bool:
+    """
+    Whether the compiled kernels should be used for `backend` ('auto', 'numpy' or 'numba').
+    'auto' uses them when Numba is installed, 'numba' falls back to NumPy with a warning.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+    global _fallback_logged
+    if backend == 'numba' and not NUMBA_AVAILABLE and not _fallback_logged:
+        logger.warning("Numba is not installed, falling back to the NumPy backend")
+        _fallback_logged = True
+    return backend != 'numpy' and NUMBA_AVAILABLE
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def pivot_points_kernel(highs, lows, window):
+        length = len(highs)
+        pivot_lows = np.full(length, np.nan)
+        pivot_highs = np.full(length, np.nan)
+
+        for current in range(window, length - window):
+            is_greater = True
+            is_less = True
+            for offset in range(1, window + 1):
+                if highs[current] < highs[current - offset] or highs[current] < highs[current + offset]:
+                    is_greater = False
+                if lows[current] > lows[current - offset] or lows[current] > lows[current + offset]:
+                    is_less = False
+            if is_greater:
+                pivot_highs[current] = highs[current]
+            if is_less:
+                pivot_lows[current] = lows[current]
+
+        # find last one
+        if length >= window + 2:
+            current = length - 2
+            is_greater = True
+            is_less = True
+            for neighbour in range(current - window, current + 2):
+                if neighbour == current:
+                    continue
+                if highs[current] < highs[neighbour]:
+                    is_greater = False
+                if lows[current] > lows[neighbour]:
+                    is_less = False
+            if is_greater:
+                pivot_highs[current] = highs[current]
+            if is_less:
+                pivot_lows[current] = lows[current]
+
+        return pivot_lows, pivot_highs
+
+    @njit(cache=True)
+    def divergence_hits_kernel(close, pivots, positions, indicators, bearish):
+        """(pivot, indicator column, previous pivot) of every divergence whose line holds, in walk order."""
+        columns = indicators.shape[1]
+        hits = np.empty((len(positions) * columns, 3), dtype=np.int64)
+        hit_count = 0
+
+        for current_rank in range(len(positions)):
+            current_pivot = positions[current_rank]
+            for column in range(columns):
+                prev_pivot = -1
+                for prev_rank in range(current_rank - 1, max(current_rank - 5, 0) - 1, -1):
+                    candidate = positions[prev_rank]
+                    if ((pivots[current_pivot] < pivots[candidate] and indicators[current_pivot, column] > indicators[candidate, column])
+                            or (pivots[current_pivot] > pivots[candidate] and indicators[current_pivot, column] < indicators[candidate, column])):
+                        prev_pivot = candidate
+                        break
+                if prev_pivot < 0:
+                    continue
+
+                length = current_pivot - prev_pivot
+                can_exist = True
+                for i in range(1, length):
+                    point = close[prev_pivot] + (close[current_pivot] - close[prev_pivot]) * i / length
+                    indicator_point = (indicators[prev_pivot, column]
+                                       + (indicators[current_pivot, column] - indicators[prev_pivot, column]) * i / length)
+                    if bearish:
+                        crosses = point <= close[prev_pivot + i] or indicator_point <= indicators[prev_pivot + i, column]
+                    else:
+                        crosses = point >= close[prev_pivot + i] or indicator_point >= indicators[prev_pivot + i, column]
+                    if crosses:
+                        can_exist = False
+                        break
+                if can_exist:
+                    hits[hit_count, 0] = current_pivot
+                    hits[hit_count, 1] = column
+                    hits[hit_count, 2] = prev_pivot
+                    hit_count += 1
+
+        return hits[:hit_count]
+
+    @njit(cache=True)
+    def smoothing_rows_kernel(values, start, periods, alphas, seeds, out):
+        """
+        Exponential smoothing of `values` for every period, into the rows of `out`: row i
+        starts at start + periods[i] - 1 with seeds[i] and follows
+        level += alphas[i] * (value - level), the recursion of TA-Lib's EMA, ATR and RSI.
+        """
+        length = len(values)
+        for row in range(len(periods)):
+            first = start + periods[row] - 1
+            out[row, :min(first, length)] = np.nan
+            if first >= length:
+                continue
+            alpha = alphas[row]
+            level = seeds[row]
+            out[row, first] = level
+            for index in range(first + 1, length):
+                level += alpha * (values[index] - level)
+                out[row, index] = level
+
+    @njit(cache=True)
+    def rsi_rows_kernel(gains, losses, periods, gain_seeds, loss_seeds, out):
+        """Wilder's RSI for every period: gains and losses smoothed side by side from candle 1, like TA-Lib."""
+        length = len(gains)
+        for row in range(len(periods)):
+            period = periods[row]
+            out[row, :min(period, length)] = np.nan
+            if period >= length:
+                continue
+            alpha = 1.0 / period
+            gain = gain_seeds[row]
+            loss = loss_seeds[row]
+            for index in range(period, length):
+                if index > period:
+                    gain += alpha * (gains[index] - gain)
+                    loss += alpha * (losses[index] - loss)
+                total = gain + loss
+                out[row, index] = 100.0 * gain / total if total != 0.0 else 0.0
+
+    @njit(cache=True)
+    def window_moments(values, end, period):
+        """Mean and sum of squared deviations of values[end - period:end], two pass."""
+        mean = 0.0
+        for index in range(end - period, end):
+            mean += values[index]
+        mean /= period
+        squares = 0.0
+        for index in range(end - period, end):
+            squares += (values[index] - mean) ** 2
+        return mean, squares
+
+    @njit(cache=True)
+    def rolling_std_rows_kernel(values, periods, ddof, out):
+        """
+        Rolling standard deviation for every period: a sliding window Welford update,
+        recomputed exactly every 256 candles so rounding errors do not pile up.
+        """
+        length = len(values)
+        for row in range(len(periods)):
+            period = periods[row]
+            out[row, :min(period - 1, length)] = np.nan
+            if period > length:
+                continue
+            (mean, squares) = window_moments(values, period, period)
+            out[row, period - 1] = np.sqrt(max(squares, 0.0) / (period - ddof))
+            for index in range(period, length):
+                if index % 256 == 0:
+                    (mean, squares) = window_moments(values, index + 1, period)
+                else:
+                    value = values[index]
+                    oldest = values[index - period]
+                    previous = mean
+                    mean += (value - oldest) / period
+                    squares += (value - oldest) * (value - mean + oldest - previous)
+                out[row, index] = np.sqrt(max(squares, 0.0) / (period - ddof))
+
+    @njit(cache=True)
+    def exit_scan_kernel(opens, highs, lows, minutes, enters, entry, end, fee, stoploss, trailing_stop,
+                         positive, offset, only_offset, roi_minutes, roi_ratios, ignore_roi):
+        """
+        The stoploss / ROI scan of one trade candle by candle: (candle, kind, stop, stop ratio)
+        of the first stoploss (kind 1), ROI (2) or trailing stop (3) exit in [entry, end], candle
+        -1 when none. `positive` is NaN without trailing_stop_positive.
+        """
+        length = len(opens)
+        open_rate = opens[entry]
+        initial = open_rate * (1 - stoploss)
+        stop = initial
+        stop_ratio = stoploss
+        roi_entry = -1
+        for index in range(entry, min(end, length - 1) + 1):
+            best = np.round(highs[index] * (1 - fee) / (open_rate * (1 + fee)) - 1, 8)
+            # the stop only follows the high when it was not hit
+            if trailing_stop and stop < lows[index] and not (only_offset and best < offset):
+                ratio = positive if (not np.isnan(positive) and best > offset) else stoploss
+                raised = highs[index] * (1 - ratio)
+                if raised > stop:
+                    stop = raised
+                    stop_ratio = ratio
+            if index == end:
+                break
+
+            age = minutes[index] - minutes[entry]
+            while roi_entry + 1 < len(roi_minutes) and roi_minutes[roi_entry + 1] <= age:
+                roi_entry += 1
+            roi_hit = roi_entry >= 0 and best > roi_ratios[roi_entry] and not (ignore_roi and enters[index])
+            if stop >= lows[index]:
+                if stop <= initial:
+                    return (index, 1, stop, stop_ratio)
+                return (index, 2 if roi_hit else 3, stop, stop_ratio)
+            if roi_hit:
+                return (index, 2, stop, stop_ratio)
+        return (-1, 0, stop, stop_ratio)
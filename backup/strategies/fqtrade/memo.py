@@ -0,0 +1,116 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+logger = logging.getLogger(__name__)
+
+
+def result_nbytes(result) -> int:
+    if isinstance(result, DataFrame):
+        return int(result.memory_usage(index=False).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=False))
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(result_nbytes(item) for item in result)
+    return int(getattr(result, 'nbytes', 0))
+
+
+def result_copy(result):
+    # results without copy() (e.g. read-only IndicatorBanks) are shared as they are
+    if isinstance(result, (tuple, list)):
+        return type(result)(result_copy(item) for item in result)
+    return result.copy() if hasattr(result, 'copy') else result
+
+
+class IndicatorCache():
+    """
+    Memo of indicator results shared by every strategy loaded in the process, e.g. with
+    `backtesting --strategy-list` or strategies that compute the same indicator.
+
+    Results are keyed by pair, timeframe, indicator name and parameters, plus the length and
+    first / last candle date of the dataframe, so a result is only reused for the same candles.
+    The least recently used results are dropped once they take more than `max_bytes`, which
+    bounds the memory of every process (e.g. each hyperopt worker keeps its own cache).
+    Callers get a copy and can modify it freely.
+
+        stoch = INDICATOR_CACHE.get(dataframe, metadata['pair'], self.timeframe, 'STOCHF',
+                                    ta.STOCHF, 5, 3, 0, 3, 0)
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[Hashable, Tuple[object, int]]' = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        # pickled along with strategies sent to hyperopt workers: start them with an empty cache
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def key(self, dataframe: DataFrame, pair: str, timeframe: str, name: Hashable, args: tuple, kwargs: dict) -> Hashable:
+        dates = dataframe['date']
+        span = (len(dataframe), pd.Timestamp(dates.iat[0]).value, pd.Timestamp(dates.iat[-1]).value) \
+            if len(dataframe) else (0, None, None)
+        return (pair, timeframe, name, args, tuple(sorted(kwargs.items())), span)
+
+    def get(self, dataframe: DataFrame, pair: str, timeframe: str, name: Hashable, function: Callable, *args, **kwargs):
+        """`function(dataframe, *args, **kwargs)`, computed once per pair, timeframe, parameters and candles."""
+        key = self.key(dataframe, pair, timeframe, name, args, kwargs)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result_copy(entry[0])
+
+        self.misses += 1
+        result = function(dataframe, *args, **kwargs)
+        nbytes = result_nbytes(result)
+        if nbytes <= self.max_bytes:
+            self.entries[key] = (result_copy(result), nbytes)
+            self.nbytes += nbytes
+            self.evict()
+        return result
+
+    def evict(self):
+        while self.nbytes > self.max_bytes and self.entries:
+            (_, (_, nbytes)) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"Indicator cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%} hit rate), {stats['evictions']} evictions, "
+                    f"{stats['entries']} entries using {stats['bytes'] / 2**20:.1f} of "
+                    f"{stats['max_bytes'] / 2**20:.0f} MiB")
+
+
+INDICATOR_CACHE = IndicatorCache()
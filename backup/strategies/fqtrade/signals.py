@@ -0,0 +1,98 @@
+"""
+Entry / exit signals from conditions on NumPy views of the dataframe columns.
+
+The usual populate_entry_trend builds a boolean Series per condition over the whole dataframe
+and writes enter_long / enter_tag with masked .loc assignments, a dozen pandas operations per
+call. In dry-run / live the bot only reads the signal of the last candle, so there the
+conditions are evaluated for that candle alone: Candles hands out views that start at it, and
+shift() reads the candles a condition looks back at from the same columns, so the window is
+exactly as long as the largest shift. The last candle gets the same signal as a full
+evaluation; earlier candles carry none (e.g. in FreqUI). Backtesting, hyperopt and plotting
+evaluate every candle, still without going through pandas.
+
+    candles = signals.signal_candles(self, dataframe)
+    buy_1 = (candles['rsi'] < candles.shift('rsi', 1)) & (candles['close'] < candles['sma_15'])
+    return signals.set_signals(dataframe, candles, {'buy_1': buy_1}, 'enter_long', 'enter_tag')
+"""
+from typing import Dict
+
+import numpy as np
+from freqtrade.enums import RunMode
+from pandas import DataFrame
+
+
+TAIL_RUNMODES = (RunMode.DRY_RUN, RunMode.LIVE)
+
+
+class Candles():
+    """The columns of `dataframe` as NumPy views, from the candle at position `start` on."""
+
+    def __init__(self, dataframe: DataFrame, start: int = 0):
+        self.dataframe = dataframe
+        self.start = start
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.dataframe) - self.start
+
+    def values(self, name: str) -> np.ndarray:
+        """The whole column."""
+        values = self.columns.get(name)
+        if values is None:
+            values = self.dataframe[name].to_numpy()
+            self.columns[name] = values
+        return values
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values(name)[self.start:]
+
+    def shift(self, name: str, periods: int = 1) -> np.ndarray:
+        """dataframe[name].shift(periods): the value `periods` candles earlier, NaN before the first candle."""
+        values = self.values(name)
+        shifted = values[max(self.start - periods, 0):max(len(values) - periods, 0)]
+        if len(shifted) < len(self):
+            shifted = np.concatenate((np.full(len(self) - len(shifted), np.nan), shifted))
+        return shifted
+
+
+def signal_candles(strategy, dataframe: DataFrame) -> Candles:
+    """The candles whose signals are used: the last one in dry-run / live, otherwise all of them."""
+    if strategy.config.get('runmode') in TAIL_RUNMODES:
+        return Candles(dataframe, max(len(dataframe) - 1, 0))
+    return Candles(dataframe)
+
+
+def set_signals(dataframe: DataFrame, candles: Candles, conditions: Dict[str, np.ndarray],
+                signal: str, tag: str) -> DataFrame:
+    """
+    Set `signal` to 1 on the candles where any of `conditions` holds and `tag` to the names of
+    those that hold, the same columns as
+
+        dataframe.loc[:, tag] = ''
+        dataframe.loc[condition, tag] += name    # for each condition
+        dataframe.loc[reduce(lambda x, y: x | y, conditions), signal] = 1
+
+    advise_entry / advise_exit already start `tag` out empty, so only the candles with a signal
+    are written to it (a full string column costs more than the conditions). Candles before
+    `candles.start` keep the value `signal` had, NaN when it is new.
+    """
+    fired = np.zeros(len(candles), dtype=bool)
+    tags = np.full(len(candles), '', dtype=object)
+    for (name, condition) in conditions.items():
+        condition = np.asarray(condition, dtype=bool)
+        fired |= condition
+        tags[condition] += name
+
+    if signal in dataframe:
+        values = dataframe[signal].to_numpy(dtype=np.float64, copy=True)
+    else:
+        values = np.full(len(dataframe), np.nan)
+    values[candles.start:][fired] = 1
+    dataframe[signal] = values
+
+    if tag not in dataframe:
+        dataframe[tag] = ''
+    rows = np.flatnonzero(fired)
+    if len(rows):
+        dataframe.iloc[candles.start + rows, dataframe.columns.get_loc(tag)] = tags[rows]
+    return dataframe
@@ -0,0 +1,214 @@
+"""
+Streaming indicators for dry-run / live.
+
+With process_only_new_candles, populate_indicators gets the same history plus one new
+candle each time, and TA-Lib recomputes every indicator over all of it. The indicators here
+keep their state (ring buffers, running averages, min / max deques) and take one candle per
+update() in constant time, so only the new candles are computed. They follow the TA-Lib
+(and pandas_ta, for CTI) formulas and leave the same leading NaNs; values match up to float
+rounding, except that recursive ones (RSI) carry their state from before the first candle
+of a sliding live window, where a full recomputation starts over.
+
+    stream = StreamingIndicators({'rsi': partial(streaming.RSI, 14), 'cci': partial(streaming.CCI, 20)})
+    for (name, values) in stream.update(metadata['pair'], dataframe).items():
+        dataframe[name] = values
+"""
+import math
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from fqtrade.indicators import columns
+
+
+class SMA():
+    """ta.SMA of the close."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.window.append(close)
+        if len(self.window) < self.period:
+            return math.nan
+        # summed again every candle, a running sum would drift over a long live session
+        return math.fsum(self.window) / self.period
+
+
+class RSI():
+    """ta.RSI of the close, Wilder's smoothing."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.previous: Optional[float] = None
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.previous is None:
+            self.previous = close
+            return math.nan
+        change = close - self.previous
+        self.previous = close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+
+        self.count += 1
+        period = self.period
+        if self.count < period:
+            self.gain += gain
+            self.loss += loss
+            return math.nan
+        if self.count == period:
+            self.gain = (self.gain + gain) / period
+            self.loss = (self.loss + loss) / period
+        else:
+            self.gain = (self.gain * (period - 1) + gain) / period
+            self.loss = (self.loss * (period - 1) + loss) / period
+        total = self.gain + self.loss
+        return 100.0 * (self.gain / total) if total != 0.0 else 0.0
+
+
+class StochasticFast():
+    """
+    fastk of ta.STOCHF(fastk_period, fastd_period): TA-Lib leaves it NaN until fastd is
+    available too. Highest high / lowest low come from monotonic deques.
+    """
+
+    def __init__(self, fastk_period: int = 5, fastd_period: int = 3):
+        self.fastk_period = fastk_period
+        self.lookback = fastk_period - 1 + fastd_period - 1
+        self.count = 0
+        self.highs = deque()
+        self.lows = deque()
+
+    def update(self, high: float, low: float, close: float) -> float:
+        index = self.count
+        self.count += 1
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((index, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((index, low))
+        oldest = index - self.fastk_period + 1
+        while self.highs[0][0] < oldest:
+            self.highs.popleft()
+        while self.lows[0][0] < oldest:
+            self.lows.popleft()
+
+        if index < self.lookback:
+            return math.nan
+        lowest = self.lows[0][1]
+        diff = (self.highs[0][1] - lowest) / 100.0
+        return (close - lowest) / diff if diff != 0.0 else 0.0
+
+
+class CCI():
+    """ta.CCI over the typical price."""
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.window = deque(maxlen=period)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        price = (high + low + close) / 3
+        self.window.append(price)
+        if len(self.window) < self.period:
+            return math.nan
+        average = sum(self.window) / self.period
+        deviation = sum(abs(value - average) for value in self.window)
+        distance = price - average
+        if distance == 0.0 or deviation == 0.0:
+            return 0.0
+        return distance / (0.015 * (deviation / self.period))
+
+
+class CTI():
+    """pandas_ta.cti: correlation of the last `period` closes with a straight line."""
+
+    def __init__(self, period: int = 12):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.x_sum = 0.5 * period * (period + 1)
+        x2_sum = self.x_sum * (2 * period + 1) / 3
+        self.divisor = period * x2_sum - self.x_sum * self.x_sum
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.window.append(close)
+        if len(self.window) < self.period:
+            return math.nan
+        values = np.fromiter(self.window, dtype=np.float64, count=self.period)
+        y_sum = values.sum()
+        xy_sum = (np.arange(1, self.period + 1) * values).sum()
+        y2_sum = (values * values).sum()
+        numerator = self.period * xy_sum - self.x_sum * y_sum
+        return numerator / (self.divisor * (self.period * y2_sum - y_sum * y_sum)) ** 0.5
+
+
+class PairStream():
+    def __init__(self, indicators: Dict[str, object]):
+        self.indicators = indicators
+        self.last_date: Optional[int] = None
+        self.values: Dict[str, np.ndarray] = {}
+
+
+class StreamingIndicators():
+    """
+    Indicator columns per pair, kept up to date candle by candle. update() finds the candles
+    after the last one it has seen and only feeds those to the indicators; whenever the
+    dataframe does not continue the previous one (first call, gap, reload) the pair starts over.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], object]]):
+        self.factories = factories
+        self.pairs: Dict[str, PairStream] = {}
+
+    def new_candles(self, stream: Optional[PairStream], dataframe: DataFrame) -> Optional[int]:
+        """Number of candles after the last one seen, None when the dataframe does not continue it."""
+        if stream is None or stream.last_date is None:
+            return None
+        dates = dataframe['date']
+        length = len(dataframe)
+        for new in range(length):
+            date = pd.Timestamp(dates.iat[length - 1 - new]).value
+            if date == stream.last_date:
+                known = length - new
+                return new if known <= len(next(iter(stream.values.values()), ())) else None
+            if date < stream.last_date:
+                return None
+        return None
+
+    def update(self, pair: str, dataframe: DataFrame) -> Dict[str, np.ndarray]:
+        stream = self.pairs.get(pair)
+        new = self.new_candles(stream, dataframe)
+        if new is None:
+            stream = PairStream({name: factory() for (name, factory) in self.factories.items()})
+            self.pairs[pair] = stream
+            new = len(dataframe)
+        (high, low, close) = columns(dataframe, 'high', 'low', 'close')
+
+        start = len(dataframe) - new
+        computed = {name: np.empty(new) for name in stream.indicators}
+        for offset in range(new):
+            candle = (high[start + offset], low[start + offset], close[start + offset])
+            for (name, indicator) in stream.indicators.items():
+                computed[name][offset] = indicator.update(*candle)
+
+        # candles that left the window are dropped, earlier values are kept as they are
+        stream.values = {
+            name: np.concatenate((stream.values[name][len(stream.values[name]) - start:], computed[name]))
+            if start else computed[name]
+            for name in stream.indicators
+        }
+        for values in stream.values.values():
+            # shared with the dataframe the columns are assigned to
+            values.flags.writeable = False
+        if len(dataframe):
+            stream.last_date = pd.Timestamp(dataframe['date'].iat[-1]).value
+        return stream.values
@@ -0,0 +1,48 @@
+from datetime import datetime
+from math import isclose
+from typing import Dict, Optional, Tuple
+
+
+class TradeLevels():
+    """
+    Per-trade values that are fixed once the trade is open, e.g. stoploss and takeprofit prices
+    derived from the entry candle.
+
+    Compute them once (typically from order_filled) and store them with set(); the callbacks
+    then read them back with get(), which is a dictionary lookup by trade id and open date
+    (backtesting numbers its trades from 1 again on every run). The values are also written to
+    the trade's custom data so they survive a bot restart, that storage is only read the first
+    time a trade is seen.
+    """
+
+    def __init__(self, key: str = 'exit_levels'):
+        self.key = key
+        self.trades: Dict[Tuple[int, datetime], Optional[dict]] = {}
+
+    def get(self, trade: 'Trade') -> Optional[dict]:
+        """Stored values of `trade`, None when they were never set."""
+        key = (trade.id, trade.open_date_utc)
+        if key not in self.trades:
+            self.trades[key] = trade.get_custom_data(self.key)
+        return self.trades[key]
+
+    def set(self, trade: 'Trade', levels: dict):
+        """Store the values of `trade`, they must be JSON serializable."""
+        self.trades[(trade.id, trade.open_date_utc)] = levels
+        trade.set_custom_data(self.key, levels)
+
+    def discard(self, trade: 'Trade'):
+        """Forget a closed trade, its custom data stays with the trade."""
+        self.trades.pop((trade.id, trade.open_date_utc), None)
+
+
+def closes_trade(trade: 'Trade', order: 'Order') -> bool:
+    """
+    Whether the filled `order` exits the whole remaining position of `trade`.
+
+    Usable from order_filled in every run mode: backtesting calls it before the trade is
+    closed, so trade.is_open is still True there.
+    """
+    return (order.ft_order_side != trade.entry_side
+            and (order.safe_amount_after_fee > trade.amount
+                 or isclose(order.safe_amount_after_fee, trade.amount, rel_tol=1e-9)))
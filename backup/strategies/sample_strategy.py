@@ -14,6 +14,7 @@ from freqtrade.strategy import (BooleanParameter, CategoricalParameter, DecimalP
 # Add your lib to import here
 import talib.abstract as ta
 import freqtrade.vendor.qtpylib.indicators as qtpylib
+from fqtrade import indicators
 
 
 # This class is a sample. Feel free to customize it.
@@ -158,7 +159,11 @@ class SampleStrategy(IStrategy):
         # dataframe['ao'] = qtpylib.awesome_oscillator(dataframe)
 
         # # Keltner Channel
-        # keltner = qtpylib.keltner_channel(dataframe)
+        # high, low, close = indicators.columns(dataframe, 'high', 'low', 'close')
+        # keltner = indicators.keltner_channel(
+        #     indicators.rolling_mean(indicators.typical_price(high, low, close), 14),
+        #     indicators.atr(high, low, close, window=14), atrs=2
+        # )
         # dataframe["kc_upperband"] = keltner["upper"]
         # dataframe["kc_lowerband"] = keltner["lower"]
         # dataframe["kc_middleband"] = keltner["mid"]
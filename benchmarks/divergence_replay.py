@@ -0,0 +1,119 @@
+"""
+Equivalence check of the live divergence detection of HarmonicDivergence.
+
+Replays synthetic OHLCV candle by candle through a DivergenceState, as dry-run / live
+does, and compares every update with divergence_finder_dataframe on the same frame:
+occurences, lines and the total_* columns. Any difference makes the run exit with
+status 1.
+
+By default the frame grows by one candle per update and the whole frame is compared. With
+--window the frame slides over the candles at a fixed length, like the dataframe live
+trading analyzes. The batch finder then misses the pivots that slid out of the frame, so
+only the rows the update still evaluates are compared: the last six candles (a pivot is
+decided five candles after it) and the count / mask rows their hits are written to. The
+frame must be long enough to hold the five previous pivots of each kind, 300 candles are.
+
+Runs offline on CPU only:
+
+    python benchmarks/divergence_replay.py
+    python benchmarks/divergence_replay.py --size 2000 --backend numba
+    python benchmarks/divergence_replay.py --size 900 --window 300
+"""
+import argparse
+import sys
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+ROOT = Path(__file__).resolve().parents[1]
+STRATEGIES = ROOT / 'backup' / 'strategies'
+sys.path.insert(0, str(STRATEGIES))
+warnings.simplefilter('ignore', FutureWarning)
+
+import HarmonicDivergence as hd  # noqa: E402
+from fqtrade import ColumnBuffer  # noqa: E402
+from harmonic_divergence import PAIR, strategy  # noqa: E402
+from synthetic_data import synthetic_ohlcv  # noqa: E402
+
+
+def divergences(frame: pd.DataFrame, find) -> tuple:
+    """Occurences, lines and total_* columns of one divergence finder on `frame`."""
+    buffer = ColumnBuffer(frame)
+    hd.initialize_divergences_lists(buffer)
+    (bearish, bearish_lines, bullish, bullish_lines) = find(buffer)
+    return (bearish, bullish, bearish_lines, bullish_lines, buffer.columns)
+
+
+def tail(result: tuple, rows: int) -> tuple:
+    """The part of a divergences() result about the last `rows` candles of the frame."""
+    (bearish, bullish, bearish_lines, bullish_lines, columns) = result
+    length = len(bearish)
+    # line slots depend on the lines before the tail, compare the segments only
+    lines = [[sorted(segment for segments in slots for segment in segments if segment[1] >= length - rows)
+              for slots in side_lines] for side_lines in (bearish_lines, bullish_lines)]
+    # hits count 30 rows before the candle they were found on
+    totals = {column: values[-rows:] if column.endswith('_divergences') else values[-rows - 30:-30]
+              for (column, values) in columns.items()}
+    return (bearish[-rows:], bullish[-rows:], lines[0], lines[1], totals)
+
+
+def differences(batch: tuple, live: tuple) -> List[str]:
+    names = []
+    for (name, expected, actual) in zip(('bearish', 'bullish'), batch[:2], live[:2]):
+        if not np.array_equal(expected, actual, equal_nan=True):
+            names.append(name + ' occurences')
+    for (name, expected, actual) in zip(('bearish', 'bullish'), batch[2:4], live[2:4]):
+        if expected != actual:
+            names.append(name + ' lines')
+    names.extend(column for column in batch[4] if not np.array_equal(batch[4][column], live[4][column], equal_nan=True))
+    return names
+
+
+def replay(size: int, backend: str, seed: int, window: Optional[int] = None) -> int:
+    """Number of candles whose live result differs from the batch one, on frames of at most `window` candles."""
+    instance = strategy(backend)
+    # the divergence indicators only look back, so every prefix of the populated frame is
+    # what live would have computed at that candle
+    candles = instance.populate_indicators(synthetic_ohlcv(size, seed, hd.HarmonicDivergence.timeframe),
+                                           {'pair': PAIR})
+    state = hd.DivergenceState(hd.DIVERGENCE_INDICATORS)
+    mismatches = 0
+    for length in range(1, size + 1):
+        frame = candles.iloc[max(0, length - (window or length)):length].copy().reset_index(drop=True)
+        pivots = hd.pivot_points(frame, backend=backend)
+        frame['pivot_lows'] = pivots['pivot_lows']
+        frame['pivot_highs'] = pivots['pivot_highs']
+
+        batch = divergences(frame, lambda buffer: hd.divergence_finder_dataframe(frame, hd.DIVERGENCE_INDICATORS,
+                                                                                 buffer, backend))
+        live = divergences(frame, lambda buffer: state.update(frame, buffer))
+        if window:
+            rows = state.window + 1
+            (batch, live) = (tail(batch, rows), tail(live, rows))
+        different = differences(batch, live)
+        if different:
+            mismatches += 1
+            print(f"candle {length}: {', '.join(different)}", file=sys.stderr)
+    return mismatches
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=500, help='candles to replay')
+    parser.add_argument('--backend', choices=hd.kernels.BACKENDS, default='numpy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--window', type=int, help='slide a frame of this many candles instead of growing it')
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore', RuntimeWarning)
+    mismatches = replay(args.size, args.backend, args.seed, args.window)
+    print(f"{args.size} candles replayed, {mismatches} differ from divergence_finder_dataframe", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
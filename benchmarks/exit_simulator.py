@@ -0,0 +1,185 @@
+"""
+Equivalence check of ExitSimulator with freqtrade's backtesting.
+
+Backtests one known trade per exit kind (ROI, a later ROI step, stoploss, trailing stoploss
+with and without an offset) on handmade candles, once with freqtrade's Backtesting and once
+with ExitSimulator, and compares the trades: dates and exit reason exactly, rates, amount and
+profit up to float rounding. Any difference, or a trade that does not exit the way its case
+expects, makes the run exit with status 1.
+
+Runs offline on CPU only, the exchange markets are patched in like freqtrade's own tests do:
+
+    python benchmarks/exit_simulator.py
+    python benchmarks/exit_simulator.py --backend numba
+"""
+import argparse
+import sys
+import warnings
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+ROOT = Path(__file__).resolve().parents[1]
+STRATEGIES = ROOT / 'backup' / 'strategies'
+sys.path.insert(0, str(STRATEGIES))
+warnings.simplefilter('ignore', FutureWarning)
+
+from freqtrade.configuration import TimeRange  # noqa: E402
+from freqtrade.enums import CandleType, ExitType, RunMode  # noqa: E402
+from freqtrade.exchange import Exchange  # noqa: E402
+from freqtrade.optimize.backtesting import Backtesting  # noqa: E402
+from freqtrade.strategy import IStrategy  # noqa: E402
+
+from fqtrade import kernels  # noqa: E402
+from fqtrade.exits import ExitSimulator  # noqa: E402
+
+
+PAIR = 'BTC/USDT'
+# the entry signal is on this candle, the trade opens at the next one
+ENTRY = 20
+FLAT = [100.0] * (ENTRY + 1)
+
+
+def rising(start: float, step: float, count: int) -> List[float]:
+    return [start * (1 + step) ** candle for candle in range(1, count + 1)]
+
+
+# name: (strategy settings, exit reason of the trade, closes)
+CASES = {
+    'roi': (
+        {'minimal_roi': {0: 0.05}, 'stoploss': -0.1, 'trailing_stop': False},
+        ExitType.ROI, FLAT + rising(100, 0.01, 20)),
+    'roi step': (
+        {'minimal_roi': {0: 0.2, 180: 0.01}, 'stoploss': -0.1, 'trailing_stop': False},
+        ExitType.ROI, FLAT + rising(100, 0.002, 20)),
+    'stoploss': (
+        {'minimal_roi': {0: 1}, 'stoploss': -0.05, 'trailing_stop': False},
+        ExitType.STOP_LOSS, FLAT + rising(100, -0.01, 20)),
+    'trailing': (
+        {'minimal_roi': {0: 1}, 'stoploss': -0.1, 'trailing_stop': True, 'trailing_stop_positive': 0.02,
+         'trailing_stop_positive_offset': 0.04, 'trailing_only_offset_is_reached': True},
+        ExitType.TRAILING_STOP_LOSS, FLAT + rising(100, 0.01, 8) + rising(100 * 1.01 ** 8, -0.01, 12)),
+    'trailing stoploss': (
+        {'minimal_roi': {0: 1}, 'stoploss': -0.03, 'trailing_stop': True, 'trailing_stop_positive': None,
+         'trailing_stop_positive_offset': 0.0, 'trailing_only_offset_is_reached': False},
+        ExitType.TRAILING_STOP_LOSS, FLAT + rising(100, 0.01, 6) + rising(100 * 1.01 ** 6, -0.01, 14)),
+}
+EXACT_COLUMNS = ['pair', 'open_date', 'close_date', 'exit_reason']
+CLOSE_COLUMNS = ['open_rate', 'close_rate', 'amount', 'profit_ratio', 'profit_abs', 'stop_loss_abs']
+
+
+class KnownTrade(IStrategy):
+    """Enters once, on candle ENTRY; every exit comes from the roi / stoploss / trailing settings."""
+    INTERFACE_VERSION = 3
+    timeframe = '1h'
+    minimal_roi = {"0": 1}
+    stoploss = -0.1
+    startup_candle_count = 0
+
+    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        return dataframe
+
+    def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        dataframe['enter_long'] = (dataframe.index == ENTRY).astype(int)
+        return dataframe
+
+    def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        dataframe['exit_long'] = 0
+        return dataframe
+
+
+def candles(closes: List[float]) -> DataFrame:
+    """Candles opening at the previous close, with highs / lows 0.2% beyond the body."""
+    close = np.array(closes)
+    open_ = np.r_[close[0], close[:-1]]
+    return DataFrame({
+        'date': pd.date_range('2024-01-01', periods=len(close), freq='1h', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * 1.002,
+        'low': np.minimum(open_, close) * 0.998,
+        'close': close,
+        'volume': 1000.0,
+    })
+
+
+def config() -> dict:
+    return {
+        'runmode': RunMode.BACKTEST, 'strategy': KnownTrade.__name__, 'strategy_path': str(Path(__file__).parent),
+        'timeframe': KnownTrade.timeframe, 'stake_currency': 'USDT', 'stake_amount': 100, 'dry_run': True,
+        'dry_run_wallet': 1000, 'max_open_trades': 1, 'fee': 0.001, 'export': 'none',
+        'exchange': {'name': 'binance', 'pair_whitelist': [PAIR], 'pair_blacklist': [],
+                     'ccxt_config': {}, 'ccxt_async_config': {}},
+        'pairlists': [{'method': 'StaticPairList'}], 'user_data_dir': ROOT / 'user_data',
+        'datadir': ROOT / 'user_data' / 'data', 'entry_pricing': {'price_side': 'other'},
+        'exit_pricing': {'price_side': 'other'}, 'candle_type_def': CandleType.SPOT, 'trading_mode': 'spot',
+        'margin_mode': '',
+    }
+
+
+def market(pair: str) -> dict:
+    # no precision: freqtrade leaves the rates unrounded, as ExitSimulator does
+    (base, quote) = pair.split('/')
+    return {
+        'id': base + quote, 'symbol': pair, 'base': base, 'quote': quote, 'active': True, 'spot': True,
+        'type': 'spot', 'linear': None, 'contract': False, 'contractSize': None,
+        'precision': {'price': None, 'amount': None, 'base': None, 'quote': None},
+        'limits': {'amount': {'min': None, 'max': None}, 'cost': {'min': None, 'max': None},
+                   'price': {'min': None, 'max': None}, 'leverage': {'min': None, 'max': None}},
+        'info': {},
+    }
+
+
+def differences(expected: DataFrame, actual: DataFrame, reason: ExitType) -> List[str]:
+    if len(expected) != 1 or len(actual) != 1:
+        return [f"{len(expected)} / {len(actual)} trades instead of one"]
+    names = [] if expected['exit_reason'].iat[0] == reason.value else [f"freqtrade exits by {expected['exit_reason'].iat[0]}"]
+    names.extend(column for column in EXACT_COLUMNS if expected[column].iat[0] != actual[column].iat[0])
+    names.extend(column for column in CLOSE_COLUMNS
+                 if not np.isclose(expected[column].iat[0], actual[column].iat[0], rtol=1e-9, atol=1e-9))
+    return names
+
+
+def check(backend: str) -> int:
+    """Number of cases whose simulated trade differs from freqtrade's."""
+    def load_markets(exchange: Exchange, *args, **kwargs):
+        exchange._markets = {PAIR: market(PAIR)}
+
+    with patch.object(Exchange, 'reload_markets', load_markets):
+        backtesting = Backtesting(config())
+        backtesting._set_strategy(backtesting.strategylist[0])
+        strategy = backtesting.strategy
+        mismatches = 0
+        for (name, (settings, reason, closes)) in CASES.items():
+            for (setting, value) in settings.items():
+                setattr(strategy, setting, value)
+            processed = {PAIR: candles(closes)}
+            expected = backtesting.backtest(processed={PAIR: processed[PAIR].copy()},
+                                            start_date=processed[PAIR]['date'].iat[0],
+                                            end_date=processed[PAIR]['date'].iat[-1])['results']
+            simulator = ExitSimulator(strategy, processed, TimeRange(), fee=backtesting.fee,
+                                      startup_candles=0, backend=backend)
+            actual = simulator.simulate()['results']
+            different = differences(expected, actual, reason)
+            if different:
+                mismatches += 1
+            print(f"{name:<20} {'differs: ' + ', '.join(different) if different else 'same trade'}", file=sys.stderr)
+    return mismatches
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', choices=kernels.BACKENDS, default='numpy')
+    args = parser.parse_args(argv)
+
+    mismatches = check(args.backend)
+    print(f"{len(CASES)} known trades, {mismatches} differ from freqtrade's backtesting", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Complexity benchmark for HarmonicDivergence.
+
+Times populate_indicators, pivot_points and divergence_finder_dataframe on synthetic
+OHLCV of growing size, records the peak traced memory of each call and fits the growth
+exponent of the wall time (t ~ n^k). Anything growing faster than --max-exponent is
+flagged and makes the run exit with status 1, so an accidental O(n^2) shows up in CI.
+
+Runs offline on CPU only:
+
+    python benchmarks/harmonic_divergence.py --output hd.json
+    python benchmarks/harmonic_divergence.py --sizes 1000 10000 --baseline hd.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+ROOT = Path(__file__).resolve().parents[1]
+STRATEGIES = ROOT / 'backup' / 'strategies'
+sys.path.insert(0, str(STRATEGIES))
+warnings.simplefilter('ignore', FutureWarning)
+
+from freqtrade.data.dataprovider import DataProvider  # noqa: E402
+from freqtrade.enums import RunMode  # noqa: E402
+
+import HarmonicDivergence as hd  # noqa: E402
+from fqtrade import ColumnBuffer  # noqa: E402
+from synthetic_data import synthetic_ohlcv  # noqa: E402
+
+
+SIZES = [1_000, 10_000, 100_000, 500_000]
+TARGETS = ['populate_indicators', 'pivot_points', 'divergence_finder_dataframe']
+PAIR = 'BTC/USDT'
+
+
+def strategy(backend: str) -> hd.HarmonicDivergence:
+    # time populate_indicators itself, not loads from the on-disk indicator cache
+    config = {'runmode': RunMode.BACKTEST, 'indicator_cache': {'enabled': False}}
+    instance = hd.HarmonicDivergence(config)
+    instance.dp = DataProvider(config, None)
+    instance.divergence_backend = backend
+    instance.ft_bot_start()
+    return instance
+
+
+def calls(instance: hd.HarmonicDivergence, candles: pd.DataFrame) -> Dict[str, Callable[[], object]]:
+    """The benchmarked calls; the two helpers run on an already populated dataframe."""
+    populated = instance.populate_indicators(candles.copy(), {'pair': PAIR})
+
+    def find_divergences():
+        divergences = ColumnBuffer(populated)
+        hd.initialize_divergences_lists(divergences)
+        return hd.divergence_finder_dataframe(populated, hd.DIVERGENCE_INDICATORS, divergences, instance.divergence_backend)
+
+    return {
+        'populate_indicators': lambda: instance.populate_indicators(candles.copy(), {'pair': PAIR}),
+        'pivot_points': lambda: hd.pivot_points(populated, backend=instance.divergence_backend),
+        'divergence_finder_dataframe': find_divergences,
+    }
+
+
+def measure(call: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Best wall time over `repeat` runs, then the peak traced allocation of one more run."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        call()
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_bytes': peak}
+
+
+def growth_exponent(sizes: List[int], seconds: List[float]) -> Dict[str, Optional[float]]:
+    """Slope of log(time) over log(size): the fit over all sizes and between the two largest."""
+    if len(sizes) < 2:
+        return {'fit': None, 'tail': None}
+    x = np.log(sizes)
+    y = np.log(np.maximum(seconds, 1e-9))
+    return {
+        'fit': float(np.polyfit(x, y, 1)[0]),
+        'tail': float((y[-1] - y[-2]) / (x[-1] - x[-2])),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], targets: List[str], repeat: int, backend: str, seed: int, max_exponent: float) -> dict:
+    instance = strategy(backend)
+    # warm up caches and numba compilation outside of the measured runs
+    for call in calls(instance, synthetic_ohlcv(1_000, seed)).values():
+        call()
+
+    results = []
+    for size in sorted(sizes):
+        benchmarked = calls(instance, synthetic_ohlcv(size, seed, hd.HarmonicDivergence.timeframe))
+        for target in targets:
+            result = measure(benchmarked[target], repeat)
+            results.append({'target': target, 'size': size, **result})
+            print(f"{target:<30} {size:>9} {result['seconds']:>10.4f}s {result['peak_bytes'] / 2**20:>10.1f} MiB",
+                  file=sys.stderr)
+
+    exponents = {}
+    flagged = []
+    for target in targets:
+        rows = [row for row in results if row['target'] == target]
+        exponents[target] = growth_exponent([row['size'] for row in rows], [row['seconds'] for row in rows])
+        if any(value is not None and value > max_exponent for value in exponents[target].values()):
+            flagged.append(target)
+
+    return {
+        'benchmark': 'HarmonicDivergence',
+        'commit': git_commit(),
+        'created': pd.Timestamp.now(tz='UTC').isoformat(),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'settings': {'repeat': repeat, 'backend': backend, 'seed': seed, 'max_exponent': max_exponent},
+        'results': results,
+        'exponents': exponents,
+        'flagged': flagged,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Print the time and memory ratio (current / baseline) of every target and size present in both."""
+    previous = {(row['target'], row['size']): row for row in baseline['results']}
+    print(f"compared with {baseline.get('commit')}", file=sys.stderr)
+    for row in report['results']:
+        base = previous.get((row['target'], row['size']))
+        if base:
+            print(f"{row['target']:<30} {row['size']:>9} time x{row['seconds'] / base['seconds']:.2f}"
+                  f" memory x{row['peak_bytes'] / max(base['peak_bytes'], 1):.2f}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='candle counts to benchmark')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per size, the best one is kept')
+    parser.add_argument('--backend', choices=hd.kernels.BACKENDS, default='numpy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-exponent', type=float, default=1.5,
+                        help='flag targets whose time grows faster than n^max-exponent')
+    parser.add_argument('--output', type=Path, help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', type=Path, help='JSON report of an earlier commit to compare with')
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore', RuntimeWarning)
+    report = run(args.sizes, args.targets, args.repeat, args.backend, args.seed, args.max_exponent)
+    for target, exponent in report['exponents'].items():
+        if exponent['fit'] is not None:
+            print(f"{target:<30} n^{exponent['fit']:.2f} (largest sizes n^{exponent['tail']:.2f})"
+                  f"{'  <- superlinear' if target in report['flagged'] else ''}", file=sys.stderr)
+    if args.baseline:
+        compare(report, json.loads(args.baseline.read_text()))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    return 1 if report['flagged'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Deterministic synthetic OHLCV for offline backtests and benchmarks.
+
+Prices follow a regime switching random walk (bull / bear / range / turbulent) with
+fat tailed returns and volatility clusters. Exchange downtime leaves gaps of missing
+candles, and some candles have no trades (flat, zero volume). Candles of larger
+timeframes are aggregated from the smallest requested one, so every timeframe of a pair
+tells the same story. The same seed, pair and timeframe always give the same data.
+
+Writes the layout `freqtrade download-data` produces, so backtesting finds it as is:
+
+    python benchmarks/synthetic_data.py --pair-count 100 --timeframes 1m 15m 4h --days 365 \\
+        --datadir user_data/data/binance --data-format feather
+"""
+import argparse
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from freqtrade.data.history.datahandlers import get_datahandler
+from freqtrade.enums import CandleType
+from freqtrade.exchange import timeframe_to_seconds
+
+
+# name: (drift per day, volatility per day)
+REGIMES = {
+    'bull': (0.004, 0.03),
+    'bear': (-0.004, 0.035),
+    'range': (0.0, 0.02),
+    'turbulent': (0.0, 0.07),
+}
+DAY = 86400
+
+
+def pair_seed(seed: int, pair: str) -> np.random.SeedSequence:
+    # zlib.crc32 instead of hash(), which is salted per interpreter
+    return np.random.SeedSequence([seed, zlib.crc32(pair.encode())])
+
+
+def regime_path(rng: np.random.Generator, size: int, mean_candles: float) -> np.ndarray:
+    """Regime number of every candle; regimes last a geometric number of candles."""
+    durations = rng.geometric(1 / max(mean_candles, 1), size // max(int(mean_candles), 1) + 2)
+    while durations.sum() < size:
+        durations = np.r_[durations, rng.geometric(1 / max(mean_candles, 1), len(durations))]
+    # each regime switches to one of the others
+    steps = rng.integers(1, len(REGIMES), len(durations))
+    steps[0] = rng.integers(len(REGIMES))
+    regimes = np.cumsum(steps) % len(REGIMES)
+    return np.repeat(regimes, durations)[:size]
+
+
+def volatility_clusters(rng: np.random.Generator, size: int, length: int, strength: float) -> np.ndarray:
+    """Positive multipliers (mean ~1) that stay high or low for about `length` candles."""
+    length = max(length, 2)
+    noise = np.cumsum(rng.standard_normal(size + length))
+    smooth = (noise[length:] - noise[:-length]) / np.sqrt(length)
+    return np.exp(strength * smooth - strength ** 2 / 2)
+
+
+def missing_candles(rng: np.random.Generator, size: int, rate: float, mean_length: float) -> np.ndarray:
+    """Mask of candles lost to exchange downtime: stretches start with `rate` per candle."""
+    starts = np.flatnonzero(rng.random(size) < rate)
+    ends = np.minimum(starts + rng.geometric(1 / max(mean_length, 1), len(starts)), size)
+    depth = np.zeros(size + 1, dtype=np.int64)
+    np.add.at(depth, starts, 1)
+    np.add.at(depth, ends, -1)
+    return np.cumsum(depth[:-1]) > 0
+
+
+def synthetic_ohlcv(size: int, seed: int = 0, timeframe: str = '15m', pair: str = 'BTC/USDT',
+                    start: str = '2020-01-01', start_price: Optional[float] = None, regime_days: float = 20,
+                    cluster_days: float = 1, cluster_strength: float = 0.5, tail_df: float = 5,
+                    zero_volume_rate: float = 0.001, gap_rate: float = 0.0, gap_candles: float = 5) -> pd.DataFrame:
+    """
+    `size` candles of `timeframe` for `pair`, in the freqtrade OHLCV column layout.
+    With a gap_rate some of the `size` candles are dropped, the dates keep their place.
+    """
+    rng = np.random.default_rng(pair_seed(seed, pair))
+    seconds = timeframe_to_seconds(timeframe)
+    dt = seconds / DAY
+
+    regimes = regime_path(rng, size, regime_days / dt)
+    (drift, volatility) = (np.array(values) for values in zip(*REGIMES.values()))
+    sigma = volatility[regimes] * np.sqrt(dt) * volatility_clusters(rng, size, int(cluster_days / dt), cluster_strength)
+    shocks = rng.standard_t(tail_df, size) * np.sqrt((tail_df - 2) / tail_df)
+    returns = drift[regimes] * dt + sigma * shocks
+
+    idle = rng.random(size) < zero_volume_rate
+    returns[idle] = 0.0
+
+    if start_price is None:
+        start_price = float(np.exp(rng.uniform(np.log(0.01), np.log(50_000))))
+    log_close = np.log(start_price) + np.cumsum(returns)
+    close = np.exp(log_close)
+    open_ = np.exp(np.r_[np.log(start_price), log_close[:-1]])
+    wick = sigma / 2
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.standard_normal(size)) * wick)
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.standard_normal(size)) * wick)
+    high[idle] = low[idle] = close[idle]
+
+    volume = np.exp(rng.normal(np.log(1_000 * dt * DAY / 60), 0.5, size)) * (1 + np.abs(returns) / sigma)
+    volume[idle] = 0.0
+
+    start_ns = pd.Timestamp(start, tz='UTC').value
+    dates = start_ns + np.arange(size, dtype=np.int64) * seconds * 10**9
+    candles = pd.DataFrame({
+        'date': pd.DatetimeIndex(dates.view('M8[ns]')).tz_localize('UTC'),
+        'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+    })
+    if gap_rate > 0:
+        candles = candles[~missing_candles(rng, size, gap_rate, gap_candles)].reset_index(drop=True)
+    return candles
+
+
+def aggregate(candles: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """Resample candles to a larger timeframe (buckets aligned on the epoch, like exchanges do)."""
+    step = timeframe_to_seconds(timeframe) * 10**9
+    buckets = pd.DatetimeIndex(candles['date']).as_unit('ns').asi8 // step
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return pd.DataFrame({
+        'date': pd.DatetimeIndex((buckets[starts] * step).view('M8[ns]')).tz_localize('UTC'),
+        'open': candles['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(candles['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(candles['low'].to_numpy(), starts),
+        'close': candles['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(candles['volume'].to_numpy(), starts),
+    })
+
+
+def synthetic_pair(pair: str, timeframes: List[str], days: float, seed: int = 0, **kwargs) -> Dict[str, pd.DataFrame]:
+    """Candles of every timeframe for one pair, aggregated from the smallest timeframe."""
+    timeframes = sorted(timeframes, key=timeframe_to_seconds)
+    base = timeframes[0]
+    candles = synthetic_ohlcv(int(days * DAY // timeframe_to_seconds(base)), seed, base, pair, **kwargs)
+    return {timeframe: candles if timeframe == base else aggregate(candles, timeframe) for timeframe in timeframes}
+
+
+def pair_names(count: int, stake_currency: str = 'USDT', futures: bool = False) -> List[str]:
+    settle = f':{stake_currency}' if futures else ''
+    return [f'SYN{index:03d}/{stake_currency}{settle}' for index in range(count)]
+
+
+def write(datadir: Path, pairs: List[str], timeframes: List[str], days: float, seed: int = 0,
+          data_format: str = 'feather', candle_type: CandleType = CandleType.SPOT, **kwargs):
+    """Generate and store every pair / timeframe at the paths of freqtrade's data handler."""
+    handler = get_datahandler(datadir, data_format)
+    for pair in pairs:
+        for (timeframe, candles) in synthetic_pair(pair, timeframes, days, seed, **kwargs).items():
+            if data_format == 'feather':
+                # same file as handler.ohlcv_store, without its lz4 level 9: noise does not compress
+                # and that level takes ~1s per year of 1m candles
+                filename = handler._pair_data_filename(datadir, pair, timeframe, candle_type)
+                handler.create_dir_if_needed(filename)
+                candles.to_feather(filename, compression='lz4')
+            else:
+                handler.ohlcv_store(pair, timeframe, candles, candle_type)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--datadir', type=Path, default=Path('user_data/data/binance'))
+    parser.add_argument('--pairs', nargs='+', help='pair names, e.g. BTC/USDT ETH/USDT')
+    parser.add_argument('--pair-count', type=int, default=10, help='generate SYN000/USDT ... when --pairs is not given')
+    parser.add_argument('--timeframes', nargs='+', default=['15m'])
+    parser.add_argument('--days', type=float, default=365)
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-format', choices=['feather', 'json', 'jsongz', 'parquet'], default='feather')
+    parser.add_argument('--trading-mode', choices=['spot', 'futures'], default='spot')
+    parser.add_argument('--zero-volume-rate', type=float, default=0.001, help='share of candles without trades')
+    parser.add_argument('--gap-rate', type=float, default=0.0001, help='chance per candle that a downtime gap starts')
+    parser.add_argument('--gap-candles', type=float, default=5, help='mean length of a gap in base candles')
+    args = parser.parse_args(argv)
+
+    futures = args.trading_mode == 'futures'
+    pairs = args.pairs or pair_names(args.pair_count, futures=futures)
+    started = time.perf_counter()
+    write(args.datadir, pairs, args.timeframes, args.days, args.seed,
+          args.data_format, CandleType.FUTURES if futures else CandleType.SPOT, start=args.start,
+          zero_volume_rate=args.zero_volume_rate, gap_rate=args.gap_rate, gap_candles=args.gap_candles)
+    print(f"{len(pairs)} pairs x {len(args.timeframes)} timeframes written to {args.datadir} "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())